@@ -64,6 +64,11 @@ class InterviewEvaluation(BaseModel):
     areas_for_improvement: List[str]
     question_feedbacks: List[QuestionFeedback]
 
+class InterviewSummary(BaseModel):
+    overall_feedback: str
+    strengths: List[str]
+    areas_for_improvement: List[str]
+
 
 # ==========================================
 # PROMPTS
@@ -161,4 +166,47 @@ Interview_evaluation_prompt = """
 
     **Output Rules:**
     - Return ONLY valid JSON matching the `InterviewEvaluation` schema.
-"""
\ No newline at end of file
+"""
+Question_evaluation_prompt = """
+    You are an expert senior interviewer evaluating ONE answer from a candidate's interview.
+    The answer was transcribed from speech.
+
+    **Evaluation Dimensions:**
+    1. **Technical Accuracy:** Is the answer correct and deep?
+    2. **Communication (Verbal):** Analyze the phrasing, confident terms vs weak terms, and clarity.
+    3. **Problem Solving:** Did they approach the scenario logically?
+
+    **Your task:**
+    - Provide a score (1-10).
+    - Give specific feedback: "You mentioned X, but missed Y."
+    - Provide a better/reference answer.
+    - **Verbal Analysis:** specifically comment on how it sounded.
+
+    **Input Data:**
+    Topic: {topic}
+    Difficulty: {difficulty}
+    Q{question_id}: {question_text}
+    Candidate Answer: {user_answer}
+
+    **Output Rules:**
+    - Return ONLY valid JSON matching the `QuestionFeedback` schema.
+    - `question_id` must be {question_id}.
+"""
+
+Evaluation_summary_prompt = """
+    You are an expert senior interviewer writing the final summary of an interview.
+    Each answer has already been scored (1-10) with feedback; do not re-score them.
+
+    **Your task:**
+    - Write a short overall feedback paragraph.
+    - Bullet points for strengths and areas for improvement, based only on the per-question feedback.
+
+    **Input Data:**
+    Topic: {topic}
+    Difficulty: {difficulty}
+    Per-question feedback:
+    {feedback_digest}
+
+    **Output Rules:**
+    - Return ONLY valid JSON matching the `InterviewSummary` schema.
+"""
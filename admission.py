@@ -0,0 +1,253 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from shared_state import SharedState, get_shared_state, worker_count
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Admission control in front of the LLM endpoints.
+#   - AdmissionLimiter: a global concurrency cap per upstream with a bounded wait
+#     queue. A call waits at most <UPSTREAM>_ADMISSION_WAIT_SECONDS for a slot and
+#     is rejected at once when <UPSTREAM>_ADMISSION_QUEUE callers are already waiting
+#     (-> 503 + Retry-After), so overload turns into fast rejections instead of
+#     ever-growing latency.
+#   - UserRateLimiter: per-user token buckets (user_id, X-User-Id header or client IP)
+#     so one client looping on an endpoint can't spend everyone's OpenAI quota (-> 429).
+#     The user id is client-supplied, so requests that carry one are also charged to a
+#     wider per-IP bucket; rotating ids doesn't get a client past that.
+# With several workers (WEB_CONCURRENCY) the concurrency caps and queues are split
+# between them and the user buckets live in the shared state file (shared_state.py).
+
+
+class AdmissionError(Exception):
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(AdmissionError):
+    status_code = 503
+
+
+class RateLimited(AdmissionError):
+    status_code = 429
+
+
+class AdmissionLimiter:
+    """
+    Usage:
+
+        async with get_limiter("openai").slot():
+            ...
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        # Smoothed hold time, used to estimate Retry-After
+        self._avg_seconds = 1.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    def _retry_after(self) -> float:
+        return max(1.0, self._avg_seconds * (self.waiting + 1) / self.max_concurrent)
+
+    async def _acquire(self):
+        if not self._semaphore.locked():
+            # Free slot: acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_full"] += 1
+                raise Overloaded(f"{self.name} is at capacity, try again shortly", self._retry_after())
+            self.stats["queued"] += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise Overloaded(f"Timed out waiting for {self.name} capacity", self._retry_after())
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * (time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "avg_hold_seconds": round(self._avg_seconds, 3),
+            **self.stats,
+        }
+
+
+class UserRateLimiter:
+    """
+    Token bucket per key: `burst` requests at once, refilled at `per_minute`.
+    Idle buckets are dropped once they would be full again, so memory stays bounded.
+    With `shared`, buckets are kept in the cross-worker state file; if that is
+    briefly locked the process-local bucket is used instead.
+    """
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 10000, shared: Optional[SharedState] = None):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.shared = shared
+        self._buckets = TTLCache(max_entries=max_keys, ttl=burst / self.rate if self.rate else 3600.0)
+        # With shared buckets check() runs in worker threads (see acheck_client)
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "limited": 0, "shared_fallbacks": 0}
+
+    def _take_local(self, key: str, cost: float):
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            self._buckets.set(key, (tokens - cost if allowed else tokens, now))
+            return allowed, tokens
+
+    def check(self, key: str, cost: float = 1.0):
+        """
+        Takes `cost` tokens from the key's bucket or raises RateLimited.
+        """
+        if self.shared is not None:
+            try:
+                allowed, tokens = self.shared.take_tokens(key, cost, float(self.burst), self.rate)
+            except sqlite3.OperationalError:
+                self.stats["shared_fallbacks"] += 1
+                allowed, tokens = self._take_local(key, cost)
+        else:
+            allowed, tokens = self._take_local(key, cost)
+        if not allowed:
+            self.stats["limited"] += 1
+            retry_after = (cost - tokens) / self.rate if self.rate else 60.0
+            raise RateLimited("Too many requests, slow down", retry_after)
+        self.stats["allowed"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "burst": self.burst, "per_minute": self.rate * 60, "shared": self.shared is not None,
+            "tracked_keys": len(self._buckets), **self.stats,
+        }
+
+
+_limiters: Dict[str, AdmissionLimiter] = {}
+_user_limiter: Optional[UserRateLimiter] = None
+_ip_limiter: Optional[UserRateLimiter] = None
+
+LIMITER_DEFAULTS = {
+    # name: (max concurrent, queue length, wait seconds)
+    "openai": (64, 256, 10.0),
+    "lemonfox": (16, 64, 10.0),
+}
+
+
+def get_limiter(name: str) -> AdmissionLimiter:
+    if name not in _limiters:
+        concurrent, queue, wait = LIMITER_DEFAULTS[name]
+        prefix = name.upper()
+        # Configured values are per host; each worker gets its share
+        workers = worker_count()
+        _limiters[name] = AdmissionLimiter(
+            name,
+            max_concurrent=max(1, math.ceil(int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrent)) / workers)),
+            max_queue=max(1, math.ceil(int(os.getenv(f"{prefix}_ADMISSION_QUEUE", queue)) / workers)),
+            queue_timeout=float(os.getenv(f"{prefix}_ADMISSION_WAIT_SECONDS", wait)),
+        )
+    return _limiters[name]
+
+
+def get_user_limiter() -> UserRateLimiter:
+    global _user_limiter
+    if _user_limiter is None:
+        _user_limiter = UserRateLimiter(
+            burst=int(os.getenv("USER_RATE_LIMIT_BURST", "10")),
+            per_minute=float(os.getenv("USER_RATE_LIMIT_PER_MINUTE", "20")),
+            shared=get_shared_state(),
+        )
+    return _user_limiter
+
+
+def get_ip_limiter() -> UserRateLimiter:
+    """
+    Per-IP buckets for requests that name a user; sized for several users behind one address.
+    """
+    global _ip_limiter
+    if _ip_limiter is None:
+        _ip_limiter = UserRateLimiter(
+            burst=int(os.getenv("IP_RATE_LIMIT_BURST", "30")),
+            per_minute=float(os.getenv("IP_RATE_LIMIT_PER_MINUTE", "60")),
+            shared=get_shared_state(),
+        )
+    return _ip_limiter
+
+
+def client_key(user_id: Optional[str], header_user_id: Optional[str], client_ip: Optional[str]) -> str:
+    if user_id and user_id != "anonymous":
+        return f"user:{user_id}"
+    if header_user_id:
+        return f"user:{header_user_id}"
+    return f"ip:{client_ip or 'unknown'}"
+
+
+def check_client(user_id: Optional[str], header_user_id: Optional[str], client_ip: Optional[str]):
+    """
+    Charges the request to its user bucket and, when it names a user, to its IP bucket too.
+    Raises RateLimited.
+    """
+    key = client_key(user_id, header_user_id, client_ip)
+    if key.startswith("user:"):
+        get_ip_limiter().check(f"ip:{client_ip or 'unknown'}")
+    get_user_limiter().check(key)
+
+
+async def acheck_client(user_id: Optional[str], header_user_id: Optional[str], client_ip: Optional[str]):
+    """
+    check_client for the event loop. Shared buckets are a SQLite transaction that can
+    wait SHARED_STATE_BUSY_MS for the write lock, so they are taken in a worker thread.
+    """
+    if get_shared_state() is None:
+        check_client(user_id, header_user_id, client_ip)
+    else:
+        await asyncio.to_thread(check_client, user_id, header_user_id, client_ip)
+
+
+def retry_after_header(error: Exception) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(getattr(error, "retry_after", 1))))}
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "upstreams": {name: limiter.snapshot() for name, limiter in _limiters.items()},
+        "users": get_user_limiter().snapshot(),
+        "ips": get_ip_limiter().snapshot(),
+    }
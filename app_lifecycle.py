@@ -0,0 +1,110 @@
+import asyncio
+import importlib
+import os
+from typing import Dict, Any, Optional
+
+import llm_client
+import metrics
+import firebase_utils
+import tts_and_stt
+from generation_cache import close_generation_cache
+from model_router import get_model_router
+from transcript_builder import TokenCounter
+from question_service import get_question_pools
+from interview_sessions import close_session_store
+from audio_presynth import close_presynthesizer
+from storage import close_result_store, storage_backend
+from shared_state import close_shared_state, get_shared_state, worker_count
+from write_behind import get_write_queue
+
+# Startup/shutdown for the API process.
+# Startup itself does no blocking work: it schedules a background warm-up that
+# imports the heavy SDKs, initialises the OpenAI and Firebase clients and loads
+# the tiktoken encoding used by evaluations, and /ready reports 503 until that
+# warm-up has finished. Lemonfox stays fully lazy.
+
+_warmup_task: Optional[asyncio.Task] = None
+_metrics_task: Optional[asyncio.Task] = None
+_warmup_errors: Dict[str, str] = {}
+
+
+async def _warm_up():
+    if llm_client.is_configured():
+        try:
+            # Import off the event loop, then create the client on it
+            await asyncio.to_thread(importlib.import_module, "openai")
+            llm_client.init_async_client()
+        except Exception as e:
+            _warmup_errors["openai"] = str(e)
+            print(f"Warning: OpenAI warm-up failed: {e}")
+
+    # Evaluations count tokens with tiktoken; loading an encoding can download it,
+    # so do it here rather than inside the first request
+    await asyncio.to_thread(TokenCounter, get_model_router().route("evaluation").model)
+
+    # With STORAGE_BACKEND=sqlite/memory results never touch Firebase
+    if storage_backend() == "firestore":
+        if firebase_utils.is_configured():
+            try:
+                await asyncio.to_thread(firebase_utils.initialize_firebase)
+            except Exception as e:
+                _warmup_errors["firebase"] = str(e)
+                print(f"Warning: Firebase warm-up failed: {e}")
+        else:
+            print("Warning: No Firebase credentials found (checked Env Var and local file). Database writes will fail.")
+
+
+async def startup():
+    global _warmup_task, _metrics_task
+    _warmup_errors.clear()
+    _warmup_task = asyncio.create_task(_warm_up())
+    if metrics.MULTIPROCESS:
+        interval = float(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "15"))
+        _metrics_task = asyncio.create_task(metrics.publish_snapshots(interval))
+    get_question_pools().start()
+    get_write_queue().start()
+
+
+async def shutdown():
+    global _warmup_task, _metrics_task
+    for task in (_warmup_task, _metrics_task):
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _warmup_task = None
+    _metrics_task = None
+    await get_question_pools().stop()
+    # Flush pending result writes (or journal them) before the clients go away
+    await get_write_queue().stop()
+    close_session_store()
+    close_presynthesizer()
+    close_result_store()
+    await llm_client.close_async_client()
+    tts_and_stt.close_session()
+    await tts_and_stt.close_async_client()
+    close_generation_cache()
+    close_shared_state()
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Readiness snapshot for the /ready probe.
+    Ready once warm-up has finished and the OpenAI client (required by every LLM endpoint) exists.
+    """
+    warmup_done = _warmup_task is not None and _warmup_task.done()
+    components = {
+        "openai": {"configured": llm_client.is_configured(), "initialized": llm_client.is_initialized()},
+        "firebase": {"configured": firebase_utils.is_configured(), "initialized": firebase_utils.is_initialized()},
+        "storage": {"backend": storage_backend()},
+        "workers": {"count": worker_count(), "shared_state": get_shared_state() is not None},
+        "lemonfox": {"configured": tts_and_stt.is_configured(), "initialized": tts_and_stt.is_initialized()},
+    }
+    return {
+        "ready": warmup_done and components["openai"]["initialized"],
+        "warmup": "done" if warmup_done else "pending",
+        "components": components,
+        "errors": dict(_warmup_errors),
+    }
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Content-addressed disk cache for synthesized speech.
+# Interview questions are read aloud to many users, so audio is keyed on
+# sha256(text, voice, response_format) and kept as one file per key under
+# AUDIO_CACHE_DIR. The total size is capped at AUDIO_CACHE_MAX_MB with LRU
+# eviction (the order survives restarts through file mtimes). Files are written
+# to a temp file in the same directory and os.replace()d into place, so readers
+# never see a partial file. Hits are served straight from disk by FileResponse.
+# Several workers can share one directory: a key missing from a worker's index is
+# checked on disk and adopted, and each worker enforces the cap on what it knows.
+
+
+class AudioCacheWriter:
+    """
+    Collects one synthesis while it streams to the client; commit() publishes it atomically.
+    """
+
+    def __init__(self, cache: "AudioCache", key: str, response_format: str):
+        self.cache = cache
+        self.key = key
+        self.response_format = response_format
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        if self.size == 0:
+            os.unlink(self.tmp_path)
+            return
+        os.replace(self.tmp_path, self.cache.path(self.key, self.response_format))
+        self.cache._added(self.key, self.response_format, self.size)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (response_format, size), least recently used first
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_saved": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                # Left over from a write interrupted by a crash
+                os.unlink(path)
+                continue
+            key, _, response_format = name.partition(".")
+            if not response_format:
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, key, response_format, stat.st_size))
+        for _, key, response_format, size in sorted(entries):
+            self._index[key] = (response_format, size)
+            self.total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(text: str, voice: str, response_format: str) -> str:
+        payload = json.dumps([text, voice, response_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, response_format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{response_format}")
+
+    def _adopt(self, key: str, response_format: Optional[str]) -> Optional[tuple]:
+        # A file another worker published since this index was built
+        if response_format is None:
+            return None
+        try:
+            size = os.stat(self.path(key, response_format)).st_size
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if key not in self._index:
+                self._index[key] = (response_format, size)
+                self.total_bytes += size
+                self._evict()
+            return self._index.get(key)
+
+    def lookup(self, key: str, response_format: Optional[str] = None) -> Optional[str]:
+        """
+        Path of the cached audio, or None. A hit becomes most recently used.
+        """
+        if key not in self._index:
+            self._adopt(key, response_format)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._index.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += entry[1]
+        path = self.path(key, entry[0])
+        try:
+            # Keeps the LRU order across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+            return None
+        return path
+
+    def peek(self, key: str, response_format: Optional[str] = None) -> Optional[str]:
+        """
+        Like lookup() but leaves the stats and the LRU order alone.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None:
+            entry = self._adopt(key, response_format)
+        return None if entry is None else self.path(key, entry[0])
+
+    def writer(self, key: str, response_format: str) -> AudioCacheWriter:
+        return AudioCacheWriter(self, key, response_format)
+
+    def _added(self, key: str, response_format: str, size: int):
+        with self._lock:
+            self._forget(key)
+            self._index[key] = (response_format, size)
+            self.total_bytes += size
+            self.stats["stores"] += 1
+            self._evict()
+
+    def _forget(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            key, (response_format, size) = self._index.popitem(last=False)
+            self.total_bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.unlink(self.path(key, response_format))
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats,
+        }
+
+
+async def cache_while_streaming(stream, writer: AudioCacheWriter) -> AsyncIterator[bytes]:
+    """
+    Relays `stream` and copies it into the cache; only a complete synthesis is published.
+    """
+    completed = False
+    try:
+        async for chunk in stream:
+            writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        if completed:
+            await asyncio.to_thread(writer.commit)
+        else:
+            # Client went away or the upstream failed mid-stream
+            writer.abort()
+            await stream.aclose()
+
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """
+    The shared cache, or None when AUDIO_CACHE_MAX_MB=0 disables it.
+    """
+    global _cache
+    max_mb = float(os.getenv("AUDIO_CACHE_MAX_MB", "512"))
+    if max_mb <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            started = time.perf_counter()
+            _cache = AudioCache(os.getenv("AUDIO_CACHE_DIR", "audio_cache"), int(max_mb * 1024 * 1024))
+            print(f"DEBUG: audio cache loaded {len(_cache._index)} entries in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return _cache
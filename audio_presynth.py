@@ -0,0 +1,172 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from audio_cache import cache_while_streaming, get_audio_cache
+from shared_state import SharedState, get_shared_state
+from ttl_cache import TTLCache
+import tts_and_stt
+
+load_dotenv()
+
+# Opt-in audio pre-synthesis for generated interviews.
+# With presynthesize=true, /api/generate-interview starts background TTS jobs for
+# every question and context text right after the questions are returned. Jobs
+# run at most AUDIO_PRESYNTH_CONCURRENCY at a time and write into the audio cache,
+# so a later audio request is either a cache hit or joins the job still running
+# for the same text (jobs are shared by cache key across sessions).
+# The per-session mapping (question -> audio key) lives in a bounded TTL store,
+# mirrored to the shared state when several workers serve the API.
+
+PARTS = ("question", "context")
+
+
+class AudioSession:
+    def __init__(self, voice: str, response_format: str, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.voice = voice
+        self.response_format = response_format
+        self.created_at = time.time()
+        # (question_id, part) -> (text, audio cache key)
+        self.items: Dict[tuple, tuple] = {}
+
+
+class AudioPresynthesizer:
+    def __init__(self, concurrency: int = 4, max_sessions: int = 1000, ttl: float = 3600.0, shared: Optional[SharedState] = None):
+        self.ttl = ttl
+        self.shared = shared
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sessions = TTLCache(max_entries=max_sessions, ttl=ttl)
+        # audio cache key -> running job
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "sessions": 0, "jobs_started": 0, "jobs_deduplicated": 0, "jobs_cached": 0,
+            "jobs_failed": 0, "joined": 0, "join_timeouts": 0,
+        }
+
+    async def _synthesize(self, key: str, text: str, voice: str, response_format: str):
+        async with self._semaphore:
+            cache = get_audio_cache()
+            if cache.peek(key, response_format) is not None:
+                return
+            stream = await tts_and_stt.open_speech_stream(text, voice, response_format)
+            async for _ in cache_while_streaming(stream, cache.writer(key, response_format)):
+                pass
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["jobs_failed"] += 1
+            print(f"Warning: audio pre-synthesis failed: {task.exception()}")
+
+    def ensure(self, text: str, voice: str, response_format: str) -> str:
+        """
+        Starts a job for the text unless it is cached or already running. Returns its cache key.
+        """
+        cache = get_audio_cache()
+        key = cache.make_key(text, voice, response_format)
+        if key in self._inflight:
+            self.stats["jobs_deduplicated"] += 1
+        elif cache.peek(key, response_format) is not None:
+            self.stats["jobs_cached"] += 1
+        else:
+            task = asyncio.create_task(self._synthesize(key, text, voice, response_format))
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._inflight[key] = task
+            self.stats["jobs_started"] += 1
+        return key
+
+    async def start(self, questions: List[Dict[str, Any]], voice: str = "sarah", response_format: str = "mp3") -> AudioSession:
+        self._sessions.purge_expired()
+        session = AudioSession(voice, response_format)
+        for question in questions:
+            for part in PARTS:
+                text = question.get(part)
+                if text:
+                    session.items[(question["id"], part)] = (text, self.ensure(text, voice, response_format))
+        self._sessions.set(session.session_id, session)
+        self.stats["sessions"] += 1
+        if self.shared is not None:
+            # Shared state calls are SQLite transactions: keep them off the event loop
+            try:
+                await asyncio.to_thread(self.shared.set_json, f"audio_session:{session.session_id}", {
+                    "voice": voice, "response_format": response_format,
+                    "items": [[qid, part, text, key] for (qid, part), (text, key) in session.items.items()],
+                }, self.ttl)
+            except sqlite3.OperationalError as e:
+                print(f"Warning: could not share audio session {session.session_id}: {e}")
+        return session
+
+    async def get(self, session_id: str) -> Optional[AudioSession]:
+        session = self._sessions.get(session_id)
+        if session is None and self.shared is not None:
+            # Started by another worker; its audio lands in the shared cache directory
+            meta = await asyncio.to_thread(self.shared.get_json, f"audio_session:{session_id}")
+            session = self._sessions.get(session_id)
+            if session is None and meta is not None:
+                session = AudioSession(meta["voice"], meta["response_format"], session_id)
+                session.items = {(qid, part): (text, key) for qid, part, text, key in meta["items"]}
+                self._sessions.set(session_id, session)
+        return session
+
+    async def join(self, key: str, timeout: float):
+        """
+        Waits (up to `timeout`) for a running job on this key, if any.
+        The caller then looks the audio up in the cache and synthesizes live if it isn't there.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            return
+        self.stats["joined"] += 1
+        try:
+            # shield: a client going away must not cancel the shared job
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["join_timeouts"] += 1
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        except Exception:
+            pass # counted in _done
+
+    def close(self):
+        for task in self._inflight.values():
+            task.cancel()
+        self._inflight.clear()
+        self._sessions.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self._sessions.values()),
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            **self.stats,
+        }
+
+
+_presynthesizer: Optional[AudioPresynthesizer] = None
+
+
+def get_presynthesizer() -> AudioPresynthesizer:
+    global _presynthesizer
+    if _presynthesizer is None:
+        _presynthesizer = AudioPresynthesizer(
+            concurrency=int(os.getenv("AUDIO_PRESYNTH_CONCURRENCY", "4")),
+            max_sessions=int(os.getenv("AUDIO_PRESYNTH_MAX_SESSIONS", "1000")),
+            ttl=float(os.getenv("AUDIO_PRESYNTH_TTL_SECONDS", "3600")),
+            shared=get_shared_state(),
+        )
+    return _presynthesizer
+
+
+def close_presynthesizer():
+    global _presynthesizer
+    if _presynthesizer is not None:
+        _presynthesizer.close()
+        _presynthesizer = None
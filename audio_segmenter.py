@@ -0,0 +1,164 @@
+import asyncio
+import io
+import os
+import re
+import wave
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Long-answer transcription: split a WAV recording at pauses, transcribe the
+# pieces concurrently and stitch the text back together, so latency tracks the
+# longest segment instead of the whole answer.
+#   - Energy VAD: 30ms frames, a frame is silent when its RMS is below a threshold
+#     derived from the recording's own noise floor.
+#   - Cuts go in the middle of the pause closest to the target length; if a stretch
+#     has no usable pause it is hard-cut at the maximum length with a short overlap,
+#     and stitch() drops the words the overlap repeats.
+
+FRAME_MS = 30
+TARGET_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "30"))
+MAX_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_MAX_SECONDS", "45"))
+MIN_SILENCE_MS = int(os.getenv("TRANSCRIBE_MIN_SILENCE_MS", "300"))
+OVERLAP_SECONDS = 1.0
+
+
+def read_wav(audio: IO[bytes]) -> Tuple[np.ndarray, int]:
+    """
+    Mono int16 samples and the sample rate of a 16-bit PCM WAV file.
+    """
+    try:
+        with wave.open(audio, "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a readable WAV file: {str(e) or 'truncated data'}")
+    if width != 2:
+        raise ValueError("Only 16-bit PCM WAV is supported for long transcription")
+    samples = np.frombuffer(frames, dtype="<i2")
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+def silent_frames(samples: np.ndarray, rate: int) -> np.ndarray:
+    """
+    One bool per FRAME_MS frame, True where the frame is silence.
+    """
+    frame = max(1, rate * FRAME_MS // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=bool)
+    frames = samples[: count * frame].astype(np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    # Noise floor from the quietest frames: pauses are a few percent of a fluent answer,
+    # so a low percentile lands in them rather than in speech. Digital silence (padding)
+    # is left out so it doesn't pull the floor below the room noise of the real pauses.
+    audible = rms[rms >= 1.0]
+    floor = np.percentile(audible, 1) if audible.size else 0.0
+    # Capped below the median so the typical frame is never silent, even in an answer with
+    # no pauses at all (a recording that is mostly silence then gets hard cuts, mostly in silence)
+    threshold = min(max(floor * 3.0, 30.0), 0.5 * np.median(rms))
+    return rms < threshold
+
+
+def split_points(samples: np.ndarray, rate: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) sample ranges covering the recording, cut at pauses where possible.
+    """
+    frame = max(1, rate * FRAME_MS // 1000)
+    silent = silent_frames(samples, rate)
+    min_run = max(1, MIN_SILENCE_MS // FRAME_MS)
+
+    # Middle of every long enough pause, in samples
+    pauses = []
+    run_start = None
+    for i, is_silent in enumerate(np.append(silent, False)):
+        if is_silent and run_start is None:
+            run_start = i
+        elif not is_silent and run_start is not None:
+            if i - run_start >= min_run:
+                pauses.append((run_start + i) // 2 * frame)
+            run_start = None
+
+    total = len(samples)
+    target, longest = int(TARGET_SECONDS * rate), int(MAX_SECONDS * rate)
+    overlap = int(OVERLAP_SECONDS * rate)
+    ranges = []
+    start = 0
+    while total - start > longest:
+        candidates = [p for p in pauses if start + target // 2 <= p <= start + longest]
+        if candidates:
+            cut = min(candidates, key=lambda p: abs(p - (start + target)))
+            ranges.append((start, cut))
+            start = cut
+        else:
+            cut = start + longest
+            ranges.append((start, cut))
+            start = cut - overlap
+    ranges.append((start, total))
+    return ranges
+
+
+def to_wav(samples: np.ndarray, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def segment_wav(audio: IO[bytes]) -> Tuple[List[bytes], List[bool], float]:
+    """
+    WAV-encoded segments, whether each one overlaps the previous, and the duration in seconds.
+    """
+    samples, rate = read_wav(audio)
+    ranges = split_points(samples, rate)
+    overlaps = [i > 0 and start < ranges[i - 1][1] for i, (start, _) in enumerate(ranges)]
+    return [to_wav(samples[start:end], rate) for start, end in ranges], overlaps, len(samples) / rate
+
+
+def _words(text: str) -> List[str]:
+    return [re.sub(r"[^\w']", "", w).lower() for w in text.split()]
+
+
+def stitch(texts: List[str], overlaps: Optional[List[bool]] = None, max_overlap_words: int = 12) -> str:
+    """
+    Joins segment transcripts in order. Where a segment overlaps the previous one
+    (all of them if `overlaps` is None) the words repeated across the boundary are dropped.
+    """
+    result: List[str] = []
+    for i, text in enumerate(texts):
+        words = text.split()
+        if result and words and (overlaps is None or overlaps[i]):
+            tail, head = _words(" ".join(result[-max_overlap_words:])), _words(" ".join(words[:max_overlap_words]))
+            for k in range(min(len(tail), len(head)), 0, -1):
+                if tail[-k:] == head[:k]:
+                    words = words[k:]
+                    break
+        result.extend(words)
+    return " ".join(result)
+
+
+async def transcribe_long(audio: IO[bytes], language: str = "english") -> Dict[str, Any]:
+    """
+    Splits a WAV upload at pauses and transcribes the segments concurrently
+    (bounded by the lemonfox admission limiter inside transcribe_file).
+    """
+    from tts_and_stt import transcribe_file
+
+    segments, overlaps, duration = await asyncio.to_thread(segment_wav, audio)
+    results = await asyncio.gather(*(
+        transcribe_file(io.BytesIO(segment), "audio/wav", language, "json") for segment in segments
+    ))
+    return {
+        "text": stitch([r.get("text", "") for r in results], overlaps),
+        "language": language,
+        "duration": round(duration, 2),
+        "segments": len(segments),
+    }
@@ -0,0 +1,85 @@
+"""
+Latency and correctness benchmark for save_test_result against a local fake Firestore.
+
+"before" is the previous implementation (add + get + update/set: three round
+trips and a racy read-modify-write average); "after" is the batched
+write in firebase_utils (one commit with server-side Increments, no read).
+
+    python benchmarks/bench_firestore_writes.py --rtt 0.02 --submissions 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from firebase_admin import firestore
+
+import firebase_utils
+from fake_firestore import FakeFirestore
+
+
+def legacy_save_test_result(db, user_id, topic, difficulty, score, total_questions):
+    db.collection("users").document(user_id).collection("activities").add({
+        "type": "mock_test", "topic": topic, "difficulty": difficulty, "score": score,
+        "total_questions": total_questions, "timestamp": firestore.SERVER_TIMESTAMP,
+    })
+    user_ref = db.collection("users").document(user_id)
+    doc = user_ref.get()
+    if doc.exists:
+        data = doc.to_dict()
+        current_total = data.get("totalTests", 0)
+        current_avg = data.get("averageScore", 0)
+        new_total = current_total + 1
+        new_avg = ((current_avg * current_total) + score) / new_total
+        user_ref.update({"totalTests": new_total, "averageScore": new_avg, "lastActive": firestore.SERVER_TIMESTAMP})
+    else:
+        user_ref.set({"totalTests": 1, "averageScore": score, "interviewCount": 0, "interviewHours": 0})
+
+
+def run(label, save, db, submissions, concurrency):
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        save(f"Topic {i}", "Medium", 50 + (i % 2) * 50, 15)
+        latencies.append(time.perf_counter() - start)
+
+    rpcs_before = db.rpcs
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(submissions)))
+
+    profile = db.docs["users/bench-user"]
+    expected_avg = statistics.mean(50 + (i % 2) * 50 for i in range(submissions))
+    avg = firebase_utils.average_score(profile)
+    print(
+        f"{label:<8} p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+        f"max {max(latencies) * 1000:6.1f} ms  rpcs/save {(db.rpcs - rpcs_before) / submissions:.1f}  "
+        f"totalTests {profile['totalTests']}/{submissions}  average {avg:.1f} (expected {expected_avg:.1f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt", type=float, default=0.02)
+    parser.add_argument("--submissions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    legacy_db = FakeFirestore(args.rtt)
+    run("before", lambda *a: legacy_save_test_result(legacy_db, "bench-user", *a),
+        legacy_db, args.submissions, args.concurrency)
+
+    batched_db = FakeFirestore(args.rtt)
+    firebase_utils.get_db = lambda: batched_db
+    run("after", lambda *a: firebase_utils.save_test_result("bench-user", *a),
+        batched_db, args.submissions, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
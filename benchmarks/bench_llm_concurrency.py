@@ -0,0 +1,83 @@
+"""
+Concurrency benchmark for /api/generate-mock-test against a fake OpenAI upstream.
+
+"before" replays the old handler (sync OpenAI client inside an async endpoint),
+"after" drives the real main.app, which awaits the shared AsyncOpenAI client.
+
+    python benchmarks/bench_llm_concurrency.py --requests 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from fastapi import FastAPI
+
+from fake_openai import BackgroundServer, create_app
+
+PORT = 9101
+
+
+def legacy_app() -> FastAPI:
+    from mock_test import generate_mock_test_questions
+
+    app = FastAPI()
+
+    @app.post("/api/generate-mock-test")
+    async def generate_test(body: dict):
+        # What main.py used to do: a blocking SDK call on the event loop
+        return {"questions": generate_mock_test_questions(body["topic"], body["difficulty"])}
+
+    return app
+
+
+async def drive(app: FastAPI, total: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/api/generate-mock-test", json={"topic": f"React {i}", "difficulty": "Medium"})
+                for i in range(total)
+            ])
+            elapsed = time.perf_counter() - start
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} requests failed: {failed[0].text}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    # Every request comes from one anonymous client; don't let the per-IP/per-user
+    # limiter reject the burst being measured
+    for key in ("USER_RATE_LIMIT_PER_MINUTE", "USER_RATE_LIMIT_BURST", "IP_RATE_LIMIT_PER_MINUTE", "IP_RATE_LIMIT_BURST"):
+        os.environ.setdefault(key, "1000000")
+
+    with BackgroundServer(create_app(args.latency), PORT):
+        import main as backend
+
+        results = {}
+        for label, app in (("before (sync client)", legacy_app()), ("after (async client)", backend.app)):
+            elapsed = asyncio.run(drive(app, args.requests))
+            results[label] = args.requests / elapsed
+            print(f"{label:<22} {args.requests} requests in {elapsed:6.2f}s -> {results[label]:8.1f} req/s")
+
+    before, after = results.values()
+    print(f"speedup: {after / before:.1f}x (upstream latency {args.latency}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Accuracy and speed check for the long-answer segmenter (audio_segmenter.py).
+
+Synthesizes speech-like recordings (noise shaped by a syllable envelope, over
+a room-noise floor) with pauses at known positions, then checks that every
+cut lands inside a pause and that a recording without pauses is not
+reported as silence. Exits non-zero if a scenario fails.
+
+    python benchmarks/bench_segmenter.py
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import audio_segmenter
+
+# (duration seconds, pause every N seconds or None, pause length seconds, syllable depth)
+# Depth is how far the envelope dips between syllables: a steady voice (0.4) has
+# few quiet frames outside the pauses.
+SCENARIOS = [
+    (180, 14, 0.6, 0.85),
+    (180, 14, 0.6, 0.4),
+    (180, 8, 0.5, 0.85),
+    (180, 8, 0.5, 0.4),
+    (300, 11, 0.4, 0.85),
+    (120, None, 0.0, 0.85),
+    (120, None, 0.0, 0.4),
+]
+
+
+def synthesize(seconds: float, pause_every, pause_length: float, depth: float, rate: int = 16000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    envelope = 1 - depth + depth * np.abs(np.sin(2 * np.pi * 2.3 * t + rng.uniform(0, 6))) ** 1.5
+    samples = rng.normal(0, 1, len(t)) * 3000 * envelope
+    pauses = []
+    if pause_every:
+        start = pause_every
+        while start + pause_length < seconds:
+            samples[int(start * rate):int((start + pause_length) * rate)] = 0
+            pauses.append((start, start + pause_length))
+            start += pause_every
+    samples += rng.normal(0, 40, len(t))
+    return np.clip(samples, -32768, 32767).astype(np.int16), rate, pauses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=16000)
+    args = parser.parse_args()
+
+    failures = 0
+    for seconds, every, length, depth in SCENARIOS:
+        samples, rate, pauses = synthesize(seconds, every, length, depth, args.rate)
+        wav = audio_segmenter.to_wav(samples, rate)
+        started = time.perf_counter()
+        segments, overlaps, _ = audio_segmenter.segment_wav(io.BytesIO(wav))
+        elapsed = time.perf_counter() - started
+
+        ranges = audio_segmenter.split_points(samples, rate)
+        cuts = [end / rate for _, end in ranges[:-1]]
+        silent = audio_segmenter.silent_frames(samples, rate).mean()
+        if pauses:
+            ok = all(any(a <= cut <= b for a, b in pauses) for cut in cuts) and not any(overlaps)
+        else:
+            ok = silent < 0.5
+        failures += not ok
+        label = f"{seconds}s, pause {length}s every {every}s" if every else f"{seconds}s, no pauses"
+        label += f", depth {depth}"
+        print(
+            f"{'ok  ' if ok else 'FAIL'} {label:<40} silent {silent:4.0%}  segments {len(segments):2d}  "
+            f"cuts {[round(c, 1) for c in cuts]}  {elapsed * 1000:.0f} ms"
+        )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import main.py, run the
+lifespan startup (i.e. start accepting requests) and report ready on /ready.
+
+Each run is a new interpreter so import caches don't flatter the numbers.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+import httpx
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        t_serving = time.perf_counter() - t0
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.005)
+        t_ready = time.perf_counter() - t0
+    return t_serving, t_ready
+
+t_serving, t_ready = asyncio.run(run())
+print(json.dumps({"import": t_import, "serving": t_serving, "ready": t_ready}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    for phase in ("import", "serving", "ready"):
+        values = [s[phase] for s in samples]
+        print(f"{phase:<8} median {statistics.median(values) * 1000:7.1f} ms   max {max(values) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+In-process stand-in for the small slice of the Firestore client API that
+firebase_utils uses (collection/document refs, get/set/update/add, batches,
+transactions, and ordered/paginated queries with select/limit/start_after).
+
+Every RPC sleeps for a configurable round-trip time, and Increment /
+Maximum / SERVER_TIMESTAMP transforms are applied atomically on "commit", so both
+latency and lost-update behaviour can be compared between implementations.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1.transforms import Increment, Maximum, Sentinel
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, reference=None):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None, retry=None, timeout=None):
+        if transaction is not None:
+            transaction.lock_for_read(self.path)
+        self._db.round_trip()
+        with self._db.lock:
+            data = self._db.docs.get(self.path)
+        if data is not None and field_paths is not None:
+            data = {k: v for k, v in data.items() if k in field_paths}
+        return FakeSnapshot(self.id, data, self)
+
+    def set(self, data, merge=False):
+        self._db.round_trip()
+        self._db.apply(self.path, data, merge=merge)
+
+    def update(self, data):
+        self._db.round_trip()
+        with self._db.lock:
+            if self.path not in self._db.docs:
+                raise KeyError(f"No document to update: {self.path}")
+        self._db.apply(self.path, data, merge=True)
+
+
+class FakeQuery:
+    def __init__(self, collection, orders=(), fields=None, limit_count=None, after=None):
+        self._collection = collection
+        self._orders = list(orders)
+        self._fields = fields
+        self._limit = limit_count
+        self._after = after
+
+    def _copy(self, **changes):
+        state = {"orders": self._orders, "fields": self._fields, "limit_count": self._limit, "after": self._after}
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + [(field, direction)])
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, values):
+        return self._copy(after=values)
+
+    def _key(self, doc_id, data, field):
+        if field == "__name__":
+            return doc_id
+        return data.get(field)
+
+    def stream(self, retry=None, timeout=None):
+        db = self._collection._db
+        db.round_trip()
+        prefix = self._collection.path + "/"
+        with db.lock:
+            rows = [
+                (path[len(prefix):], dict(data)) for path, data in db.docs.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+            ]
+        # Stable multi-key sort: apply the orderings from last to first
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: self._key(row[0], row[1], field), reverse=direction == "DESCENDING")
+        if self._after is not None:
+            after = []
+            for field, _ in self._orders:
+                value = self._after[field]
+                after.append(value.id if field == "__name__" else value)
+            for index, (doc_id, data) in enumerate(rows):
+                if [self._key(doc_id, data, f) for f, _ in self._orders] == after:
+                    rows = rows[index + 1:]
+                    break
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for doc_id, data in rows:
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield FakeSnapshot(doc_id, data, self._collection.document(doc_id))
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def order_by(self, field, direction="ASCENDING"):
+        return FakeQuery(self).order_by(field, direction)
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._db, f"{self.path}/{doc_id or uuid.uuid4().hex}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return time.time(), ref
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref.path, data, merge))
+
+    def create(self, ref, data):
+        self._writes.append((ref.path, data, None))
+
+    def update(self, ref, data):
+        self._writes.append((ref.path, data, True))
+
+    def commit(self, retry=None, timeout=None):
+        self._db.round_trip()
+        with self._db.lock:
+            for path, data, merge in self._writes:
+                if merge is None and path in self._db.docs:
+                    raise AlreadyExists(f"Document already exists: {path}")
+            for path, data, merge in self._writes:
+                self._db.apply_locked(path, data, merge)
+
+
+class FakeTransaction(FakeBatch):
+    """
+    Works with firestore.transactional. Like the server client libraries, reads
+    take a lock on the document that is held until commit or rollback, so
+    concurrent transactions on one document are serialised.
+    """
+
+    def __init__(self, db, max_attempts=5):
+        super().__init__(db)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+        self._held = []
+
+    def lock_for_read(self, path):
+        lock = self._db.document_lock(path)
+        if lock not in self._held:
+            lock.acquire()
+            self._held.append(lock)
+
+    def _release(self):
+        while self._held:
+            self._held.pop().release()
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._db.round_trip()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._release()
+            self._clean_up()
+
+    def _rollback(self):
+        self._release()
+        self._clean_up()
+
+
+class FakeFirestore:
+    def __init__(self, rtt: float = 0.02):
+        self.rtt = rtt
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.rpcs = 0
+        self._document_locks = {}
+
+    def round_trip(self):
+        with self.lock:
+            self.rpcs += 1
+        time.sleep(self.rtt)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def transaction(self, max_attempts=5):
+        return FakeTransaction(self, max_attempts)
+
+    def document_lock(self, path):
+        with self.lock:
+            return self._document_locks.setdefault(path, threading.Lock())
+
+    def apply(self, path, data, merge=False):
+        with self.lock:
+            self.apply_locked(path, data, merge)
+
+    def apply_locked(self, path, data, merge):
+        current = dict(self.docs.get(path) or {}) if merge else {}
+        for field, value in data.items():
+            if isinstance(value, Increment):
+                current[field] = current.get(field, 0) + value.value
+            elif isinstance(value, Maximum):
+                current[field] = max(current.get(field, value.value), value.value)
+            elif isinstance(value, Sentinel):
+                current[field] = datetime.now(timezone.utc)
+            else:
+                current[field] = value
+        self.docs[path] = current
@@ -0,0 +1,108 @@
+"""
+Local stand-in for the Lemonfox speech API (OpenAI-compatible audio endpoints).
+
+- POST /v1/audio/speech returns audio bytes sized like real speech
+  (~AUDIO_BYTES_PER_CHAR per input character). The first chunk arrives after
+  the sampled latency and the rest trickles in, so time-to-first-byte can be
+  measured.
+- POST /v1/audio/transcriptions accepts a multipart upload or a URL and returns
+  {"text": ...} after a latency that grows with the upload size.
+
+Latency distributions and fault rates work as in fake_openai.
+
+Run standalone:
+    python benchmarks/fake_lemonfox.py --port 9200 --latency lognormal:0.4:0.4
+and point the backend at it with LEMONFOX_BASE_URL=http://127.0.0.1:9200
+"""
+import argparse
+import asyncio
+import struct
+from typing import Union
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from fake_openai import FaultInjector, LatencyModel, error_response
+
+AUDIO_BYTES_PER_CHAR = 500
+CHUNK_SIZE = 16 * 1024
+MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "opus": "audio/ogg", "aac": "audio/aac", "flac": "audio/flac"}
+
+
+def wav_header(data_size: int, sample_rate: int = 16000) -> bytes:
+    # 16-bit mono PCM
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def fake_audio(text: str, response_format: str) -> bytes:
+    size = max(CHUNK_SIZE, len(text) * AUDIO_BYTES_PER_CHAR)
+    if response_format == "wav":
+        return wav_header(size) + bytes(size)
+    # Not decodable audio, but the right size and a plausible header
+    return b"ID3\x04\x00\x00\x00\x00\x00\x00" + bytes(size)
+
+
+async def trickle(audio: bytes, first_byte_delay: float, chunk_delay: float):
+    await asyncio.sleep(first_byte_delay)
+    for i in range(0, len(audio), CHUNK_SIZE):
+        if i:
+            await asyncio.sleep(chunk_delay)
+        yield audio[i:i + CHUNK_SIZE]
+
+
+def create_app(
+    latency: Union[str, float, LatencyModel] = 0.3,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    chunk_delay: float = 0.005
+) -> FastAPI:
+    app = FastAPI()
+    latency_model = LatencyModel.parse(latency)
+    faults = FaultInjector(error_rate, rate_limit_rate)
+    app.state.faults = faults
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        fault = faults.pick()
+        if fault:
+            return error_response(fault)
+        response_format = body.get("response_format", "mp3")
+        audio = fake_audio(body.get("input", ""), response_format)
+        return StreamingResponse(
+            trickle(audio, latency_model.sample(), chunk_delay),
+            media_type=MEDIA_TYPES.get(response_format, "application/octet-stream"),
+        )
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        fault = faults.pick()
+        if fault:
+            return error_response(fault)
+        # ~1s of 16kHz PCM per 32KB; transcription runs faster than real time
+        await asyncio.sleep(latency_model.sample() + size / 32000 * 0.05)
+        return {"text": f"Transcribed {size} bytes of audio.", "language": "english"}
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"latency": latency_model.spec, **faults.stats}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Lemonfox speech upstream")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency", default="0.3", help="seconds, or a distribution spec (see fake_openai.LatencyModel)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.error_rate, args.rate_limit_rate), host="127.0.0.1", port=args.port)
@@ -0,0 +1,294 @@
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Returns schema-valid MockTest / InterviewSession / InterviewEvaluation payloads
+after an artificial delay, so the generation endpoints can be benchmarked
+without network access or API spend.
+
+Latency is drawn from a distribution (see LatencyModel.parse) and faults can be
+injected: 5xx errors, 429 rate limits and unparseable (truncated) content.
+
+Run standalone:
+    python benchmarks/fake_openai.py --port 9100 --latency lognormal:0.8:0.5 --error-rate 0.02
+and point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from typing import Optional, Union
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class LatencyModel:
+    """
+    Latency distribution, parsed from a spec string:
+        0.5 / fixed:0.5           always 0.5s
+        uniform:0.2:1.0           uniform between 0.2s and 1.0s
+        lognormal:0.8:0.5         median 0.8s, sigma 0.5 (long right tail)
+        tail:0.3:0.05:5           0.3s, but 5% of calls take 5s
+    """
+
+    def __init__(self, kind: str, params: list):
+        self.kind = kind
+        self.params = params
+        self.spec = ":".join([kind] + [str(p) for p in params])
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, "LatencyModel"]) -> "LatencyModel":
+        if isinstance(spec, LatencyModel):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", [float(spec)])
+        parts = str(spec).split(":")
+        if len(parts) == 1:
+            return cls("fixed", [float(parts[0])])
+        kind, params = parts[0], [float(p) for p in parts[1:]]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "tail": 3}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Bad latency spec: {spec}")
+        return cls(kind, params)
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return random.uniform(p[0], p[1])
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(p[0]), p[1])
+        return p[2] if random.random() < p[1] else p[0]
+
+
+class FaultInjector:
+    """
+    Decides per request whether to fail, and how.
+    """
+
+    def __init__(self, error_rate: float = 0.0, rate_limit_rate: float = 0.0, garbage_rate: float = 0.0):
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.garbage_rate = garbage_rate
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "garbage": 0}
+
+    def pick(self) -> Optional[str]:
+        self.stats["requests"] += 1
+        roll = random.random()
+        for fault, rate in (("errors", self.error_rate), ("rate_limited", self.rate_limit_rate), ("garbage", self.garbage_rate)):
+            if roll < rate:
+                self.stats[fault] += 1
+                return fault
+            roll -= rate
+        return None
+
+
+def error_response(fault: str) -> JSONResponse:
+    if fault == "rate_limited":
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429, headers={"Retry-After": "1"},
+        )
+    return JSONResponse({"error": {"message": "The server had an error", "type": "server_error"}}, status_code=500)
+
+
+def sample_mock_test() -> dict:
+    questions = []
+    for i in range(7):
+        questions.append({
+            "type": "single_choice",
+            "question": f"Single choice question {i + 1}?",
+            "options": ["A", "B", "C", "D"],
+            "answer": "A",
+        })
+    for i in range(3):
+        questions.append({
+            "type": "multi_choice",
+            "question": f"Multi choice question {i + 1}?",
+            "options": ["A", "B", "C", "D"],
+            "answers": ["A", "C"],
+        })
+    for i in range(2):
+        questions.append({"type": "written", "question": f"Written question {i + 1}?"})
+    for i in range(3):
+        questions.append({
+            "type": "code",
+            "question": f"What does snippet {i + 1} print?",
+            "code": "console.log(1 + 1)",
+        })
+    return {"questions": questions}
+
+
+def sample_interview_session() -> dict:
+    types = ["scenario"] * 3 + ["technical"] * 3 + ["opinion"] * 2 + ["challenge"] * 2
+    return {
+        "questions": [
+            {
+                "id": i + 1,
+                "type": t,
+                "question": f"Interview question {i + 1}?",
+                "context": "A production incident at 3am." if t in ("scenario", "challenge") else None,
+            }
+            for i, t in enumerate(types)
+        ]
+    }
+
+
+def sample_question_feedback(question_id: int = 1) -> dict:
+    return {
+        "question_id": question_id,
+        "score": 7,
+        "feedback": "You mentioned X, but missed Y.",
+        "improved_answer": "A stronger answer would cover X and Y.",
+        "verbal_analysis": "Clear and confident.",
+    }
+
+
+def sample_interview_evaluation() -> dict:
+    return {
+        "overall_score": 70,
+        "overall_feedback": "Solid fundamentals with room to go deeper.",
+        "strengths": ["Clear communication"],
+        "areas_for_improvement": ["Depth on internals"],
+        "question_feedbacks": [sample_question_feedback(i + 1) for i in range(10)],
+    }
+
+
+def sample_interview_summary() -> dict:
+    return {
+        "overall_feedback": "Solid fundamentals with room to go deeper.",
+        "strengths": ["Clear communication"],
+        "areas_for_improvement": ["Depth on internals"],
+    }
+
+
+SAMPLES = {
+    "MockTest": sample_mock_test,
+    "InterviewSession": sample_interview_session,
+    "InterviewEvaluation": sample_interview_evaluation,
+    "QuestionFeedback": sample_question_feedback,
+    "InterviewSummary": sample_interview_summary,
+}
+
+
+def _schema_name(body: dict) -> str:
+    response_format = body.get("response_format") or {}
+    return (response_format.get("json_schema") or {}).get("name", "MockTest")
+
+
+def completion_payload(model: str, content: str) -> dict:
+    prompt_tokens = 800
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chunk_payload(model: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def stream_completion(model: str, content: str, latency: float, chunks: int = 40):
+    # Spread the total latency across the chunks, like tokens trickling in
+    step = max(1, len(content) // chunks)
+    yield chunk_payload(model, {"role": "assistant", "content": ""})
+    for i in range(0, len(content), step):
+        await asyncio.sleep(latency / chunks)
+        yield chunk_payload(model, {"content": content[i:i + step]})
+    yield chunk_payload(model, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+def create_app(
+    latency: Union[str, float, LatencyModel] = 0.5,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    garbage_rate: float = 0.0
+) -> FastAPI:
+    app = FastAPI()
+    latency_model = LatencyModel.parse(latency)
+    faults = FaultInjector(error_rate, rate_limit_rate, garbage_rate)
+    app.state.faults = faults
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        builder = SAMPLES.get(_schema_name(body), sample_mock_test)
+        model = body.get("model", "gpt-4o")
+        content = json.dumps(builder())
+        delay = latency_model.sample()
+        fault = faults.pick()
+        if fault in ("errors", "rate_limited"):
+            await asyncio.sleep(min(delay, 0.05))
+            return error_response(fault)
+        if fault == "garbage":
+            content = content[:len(content) // 2]
+        if body.get("stream"):
+            return StreamingResponse(stream_completion(model, content, delay), media_type="text/event-stream")
+        await asyncio.sleep(delay)
+        return completion_payload(model, content)
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"latency": latency_model.spec, **faults.stats}
+
+    return app
+
+
+class BackgroundServer:
+    """
+    Runs an ASGI app with uvicorn on a background thread (so it keeps serving
+    even when the code under test blocks its own event loop).
+    """
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat-completions upstream")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="0.5", help="seconds, or a distribution spec (see LatencyModel)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="fraction of unparseable responses")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.error_rate, args.rate_limit_rate, args.garbage_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,493 @@
+"""
+Offline load test for the API.
+
+By default everything runs locally: fake OpenAI and Lemonfox servers
+(fake_openai.py / fake_lemonfox.py), an in-memory Firestore (fake_firestore.py,
+or the SQLite/memory result store with --storage), a stub Firebase ID-token check
+and main.app served by uvicorn on a background thread. Virtual users then drive every endpoint in a weighted
+mix for a fixed duration, and the report shows throughput, p50/p95/p99 latency
+and error rate per endpoint.
+
+    python benchmarks/loadtest.py --users 20 --duration 30 --latency lognormal:0.8:0.5 --error-rate 0.02
+    python benchmarks/loadtest.py --save benchmarks/results/baseline.json
+    python benchmarks/loadtest.py --compare benchmarks/results/baseline.json   # exit 1 on regression
+    python benchmarks/loadtest.py --storage sqlite --mix submit_test=1,dashboard=1
+    python benchmarks/loadtest.py --target http://127.0.0.1:8000 --mix mock_test=3,evaluate=1
+
+With --target the harness only generates load (no fakes are started), so the
+server must already point at fake or real upstreams. The dashboard scenario
+needs real ID tokens there, so leave it out of the mix.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+APP_PORT, OPENAI_PORT, LEMONFOX_PORT = 9300, 9301, 9302
+
+TOPICS = [
+    "React Js Developer", "Python Backend", "Java Spring", "Node.js", "SQL",
+    "DevOps", "AWS", "Data Engineering", "Machine Learning", "Golang",
+    "TypeScript", "Django", "System Design", "Kubernetes", "Angular",
+]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+ANSWER = (
+    "So basically I would start by, um, looking at the metrics and the logs to find where the latency comes from, "
+    "then I would reproduce it locally, add a cache in front of the slow call and make sure we measure it again. "
+) * 3
+QUESTIONS = [
+    "Can you walk me through how you would debug a slow API endpoint in production?",
+    "Tell me about a time you had to make a trade-off between speed of delivery and code quality.",
+    "How does a hash map handle collisions, and what does that mean for lookup performance?",
+    "Explain the difference between a process and a thread.",
+]
+
+
+class VirtualUser:
+    def __init__(self, index: int, client: httpx.AsyncClient, unique_ratio: float):
+        self.user_id = f"loadtest-user-{index}"
+        self.client = client
+        self.unique_ratio = unique_ratio
+        self.samples: List[Dict[str, Any]] = []
+
+    def topic(self) -> str:
+        if random.random() < self.unique_ratio:
+            return f"Niche topic {random.randrange(10 ** 9)}"
+        return random.choice(TOPICS)
+
+    def body(self) -> Dict[str, Any]:
+        return {"topic": self.topic(), "difficulty": random.choice(DIFFICULTIES)}
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """
+        One timed request; `endpoint` is the label it's reported under.
+        """
+        headers = {"X-User-Id": self.user_id, **kwargs.pop("headers", {})}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            response, status = None, 0
+            print(f"{endpoint}: {type(e).__name__}: {e}")
+        self.samples.append({"endpoint": endpoint, "status": status, "seconds": time.perf_counter() - start})
+        return response
+
+    async def stream(self, endpoint: str, url: str, json_body: Dict[str, Any]):
+        """
+        Consumes an SSE endpoint; records time to the first event and to the end.
+        A stream that ends with an `error` event counts as a failure.
+        """
+        start = time.perf_counter()
+        first_event, status = None, 0
+        try:
+            async with self.client.stream("POST", url, json=json_body, headers={"X-User-Id": self.user_id}) as response:
+                status = response.status_code
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        if first_event is None:
+                            first_event = time.perf_counter() - start
+                        if line.strip() == "event: error":
+                            status = 599
+        except Exception as e:
+            print(f"{endpoint}: {type(e).__name__}: {e}")
+        self.samples.append({
+            "endpoint": endpoint, "status": status,
+            "seconds": time.perf_counter() - start, "ttfb": first_event,
+        })
+
+    async def download(self, endpoint: str, url: str, json_body: Dict[str, Any]):
+        """
+        Consumes a binary streaming response; records time to the first body byte and to the end.
+        """
+        start = time.perf_counter()
+        first_byte, status = None, 0
+        try:
+            async with self.client.stream("POST", url, json=json_body, headers={"X-User-Id": self.user_id}) as response:
+                status = response.status_code
+                async for chunk in response.aiter_raw():
+                    if chunk and first_byte is None:
+                        first_byte = time.perf_counter() - start
+        except Exception as e:
+            print(f"{endpoint}: {type(e).__name__}: {e}")
+        self.samples.append({
+            "endpoint": endpoint, "status": status,
+            "seconds": time.perf_counter() - start, "ttfb": first_byte,
+        })
+
+    def qa_list(self, count: int = 10) -> List[Dict[str, Any]]:
+        return [
+            {"question_id": i + 1, "question_text": f"Interview question {i + 1}?", "user_answer": ANSWER}
+            for i in range(count)
+        ]
+
+
+# ---- scenarios ---------------------------------------------------------------
+
+Scenario = Callable[[VirtualUser], Awaitable[None]]
+SCENARIOS: Dict[str, Scenario] = {}
+DEFAULT_WEIGHTS: Dict[str, float] = {}
+
+
+def scenario(name: str, weight: float):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        DEFAULT_WEIGHTS[name] = weight
+        return fn
+    return register
+
+
+@scenario("mock_test", 3)
+async def mock_test(vu: VirtualUser):
+    await vu.request("POST /api/generate-mock-test", "POST", "/api/generate-mock-test", json=vu.body())
+
+
+@scenario("interview", 2)
+async def interview(vu: VirtualUser):
+    await vu.request("POST /api/generate-interview", "POST", "/api/generate-interview", json=vu.body())
+
+
+@scenario("mock_test_stream", 2)
+async def mock_test_stream(vu: VirtualUser):
+    await vu.stream("POST /api/generate-mock-test/stream", "/api/generate-mock-test/stream", vu.body())
+
+
+@scenario("interview_stream", 1)
+async def interview_stream(vu: VirtualUser):
+    await vu.stream("POST /api/generate-interview/stream", "/api/generate-interview/stream", vu.body())
+
+
+@scenario("evaluate", 2)
+async def evaluate(vu: VirtualUser):
+    mode = random.choice(["single", "parallel"])
+    await vu.request(f"POST /api/evaluate-interview ({mode})", "POST", "/api/evaluate-interview", json={
+        **vu.body(), "qa_list": vu.qa_list(), "user_id": vu.user_id, "mode": mode,
+    })
+
+
+@scenario("interview_session", 1)
+async def interview_session(vu: VirtualUser):
+    body = vu.body()
+    response = await vu.request("POST /api/interview-session", "POST", "/api/interview-session", json={**body, "user_id": vu.user_id})
+    if response is None or response.status_code != 200:
+        return
+    session_id = response.json()["session_id"]
+    qa_list = vu.qa_list(5)
+    for item in qa_list:
+        await vu.request("POST /api/interview-session/{id}/answer", "POST", f"/api/interview-session/{session_id}/answer", json=item)
+    await vu.request("POST /api/evaluate-interview (session)", "POST", "/api/evaluate-interview", json={
+        **body, "qa_list": qa_list, "user_id": vu.user_id, "session_id": session_id,
+    })
+
+
+@scenario("tts", 2)
+async def tts(vu: VirtualUser):
+    text = random.choice(QUESTIONS)
+    if random.random() < vu.unique_ratio:
+        text += f" (variant {random.randrange(10 ** 9)})" # audio cache miss
+    await vu.download("POST /api/tts", "/api/tts", {"text": text, "voice": "sarah", "response_format": "mp3"})
+
+
+@scenario("interview_audio", 1)
+async def interview_audio(vu: VirtualUser):
+    response = await vu.request(
+        "POST /api/generate-interview (presynthesize)", "POST", "/api/generate-interview",
+        json={**vu.body(), "presynthesize": True},
+    )
+    if response is None or response.status_code != 200 or "audio_session_id" not in response.json():
+        return
+    data = response.json()
+    # The candidate listens to the first questions as the interview moves on
+    for question in data["questions"][:3]:
+        await vu.request(
+            "GET /api/interview-audio/{session}/{id}", "GET",
+            f"/api/interview-audio/{data['audio_session_id']}/{question['id']}",
+        )
+
+
+@scenario("transcribe", 2)
+async def transcribe(vu: VirtualUser):
+    from fake_lemonfox import wav_header
+
+    # 5-30s of 16kHz PCM, uploaded chunked like a browser recorder would
+    size = random.randint(5, 30) * 32000
+    async def body():
+        yield wav_header(size)
+        for offset in range(0, size, 64 * 1024):
+            yield bytes(min(64 * 1024, size - offset))
+
+    await vu.request(
+        "POST /api/transcribe", "POST", "/api/transcribe",
+        content=body(), headers={"Content-Type": "audio/wav"},
+    )
+
+
+@scenario("submit_test", 2)
+async def submit_test(vu: VirtualUser):
+    await vu.request("POST /api/submit-test", "POST", "/api/submit-test", json={
+        **vu.body(), "user_id": vu.user_id, "score": random.randint(0, 100), "total_questions": 15,
+    })
+
+
+@scenario("dashboard", 2)
+async def dashboard(vu: VirtualUser):
+    # Local runs stub the ID-token check so a virtual user's token is its user id
+    auth = {"Authorization": f"Bearer {vu.user_id}"}
+    await vu.request("GET /api/users/{id}/profile", "GET", f"/api/users/{vu.user_id}/profile", headers=auth)
+    await vu.request(
+        "GET /api/users/{id}/activities", "GET", f"/api/users/{vu.user_id}/activities",
+        params={"limit": 20}, headers=auth,
+    )
+
+
+# ---- running -------------------------------------------------------------------
+
+def parse_mix(mix: Optional[str]) -> Dict[str, float]:
+    if not mix:
+        return dict(DEFAULT_WEIGHTS)
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def run_load(base_url: str, users: int, duration: float, weights: Dict[str, float], unique_ratio: float, think: float):
+    names, values = list(weights), list(weights.values())
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        vus = [VirtualUser(i, client, unique_ratio) for i in range(users)]
+        # Seed a profile per user so the dashboard reads have something to return
+        await asyncio.gather(*(submit_test(vu) for vu in vus))
+        await asyncio.sleep(0.5)
+        for vu in vus:
+            vu.samples.clear()
+
+        stop_at = time.perf_counter() + duration
+
+        async def loop(vu: VirtualUser):
+            while time.perf_counter() < stop_at:
+                await SCENARIOS[random.choices(names, values)[0]](vu)
+                if think:
+                    await asyncio.sleep(random.uniform(0, think * 2))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop(vu) for vu in vus))
+        elapsed = time.perf_counter() - started
+    return [s for vu in vus for s in vu.samples], elapsed
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    def stats(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = sorted(s["seconds"] for s in group)
+        errors = sum(1 for s in group if s["status"] == 0 or s["status"] >= 400)
+        ttfbs = sorted(s["ttfb"] for s in group if s.get("ttfb") is not None)
+        statuses: Dict[str, int] = {}
+        for s in group:
+            statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+        result = {
+            "requests": len(group),
+            "throughput_rps": round(len(group) / elapsed, 3),
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+            "statuses": statuses,
+        }
+        if ttfbs:
+            result["ttfb_p50_ms"] = round(percentile(ttfbs, 50) * 1000, 1)
+            result["ttfb_p95_ms"] = round(percentile(ttfbs, 95) * 1000, 1)
+        return result
+
+    by_endpoint: Dict[str, List[Dict[str, Any]]] = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample["endpoint"], []).append(sample)
+    return {
+        "overall": stats(samples) if samples else {},
+        "endpoints": {name: stats(group) for name, group in sorted(by_endpoint.items())},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'endpoint':48} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'ttfb50':>7}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+    for name, s in rows:
+        if not s:
+            continue
+        print(
+            f"{name[:48]:48} {s['requests']:>6} {s['throughput_rps']:>7.2f} {s['error_rate'] * 100:>6.2f} "
+            f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s.get('ttfb_p50_ms', ''):>7}"
+        )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_samples: int = 20) -> bool:
+    """
+    Prints per-endpoint deltas against a saved run. Returns True if anything regressed:
+    a latency percentile worse by more than `threshold` (and by at least 5ms), the error
+    rate up by more than 1 point, or total throughput down by more than `threshold`.
+    Endpoints with fewer than `min_samples` requests in either run are shown but not judged.
+    """
+    print(f"\nComparison with baseline ({baseline['meta'].get('git_rev')} @ {baseline['meta'].get('timestamp')}):")
+    regressed = False
+    for name, cur in list(current["endpoints"].items()) + [("TOTAL", current["overall"])]:
+        base = baseline["endpoints"].get(name) if name != "TOTAL" else baseline.get("overall")
+        if not base or not cur:
+            continue
+        notes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = cur[metric] - base[metric]
+            if base[metric] and delta > 5 and delta / base[metric] > threshold:
+                notes.append(f"{metric} {base[metric]:.0f}->{cur[metric]:.0f}")
+        if name == "TOTAL" and base["throughput_rps"] and (base["throughput_rps"] - cur["throughput_rps"]) / base["throughput_rps"] > threshold:
+            notes.append(f"rps {base['throughput_rps']:.2f}->{cur['throughput_rps']:.2f}")
+        if cur["error_rate"] - base["error_rate"] > 0.01:
+            notes.append(f"errors {base['error_rate']:.2%}->{cur['error_rate']:.2%}")
+        change = (cur["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+        judged = min(cur["requests"], base["requests"]) >= min_samples
+        if not judged:
+            status = f"too few samples ({min(cur['requests'], base['requests'])})"
+        else:
+            status = "REGRESSED " + ", ".join(notes) if notes else "ok"
+            regressed = regressed or bool(notes)
+        print(f"  {name[:48]:48} p95 {base['p95_ms']:>8.1f} -> {cur['p95_ms']:>8.1f} ms ({change:+.1f}%)  {status}")
+    return regressed
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def configure_local_env(args, workdir: str):
+    # setdefault so anything exported by the caller wins
+    defaults = {
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{OPENAI_PORT}/v1",
+        "LEMONFOX_API_KEY": "fake-key",
+        "LEMONFOX_BASE_URL": f"http://127.0.0.1:{LEMONFOX_PORT}",
+        "POOL_HOT_TOPICS": "",
+        "WRITE_BEHIND_JOURNAL": os.path.join(workdir, "journal.jsonl"),
+        "GENERATION_CACHE_DB": os.path.join(workdir, "generation_cache.sqlite3"),
+        "AUDIO_CACHE_DIR": os.path.join(workdir, "audio_cache"),
+        "STORAGE_BACKEND": args.storage,
+        "STORAGE_SQLITE_PATH": os.path.join(workdir, "results.sqlite3"),
+    }
+    if not args.keep_user_limits:
+        # Virtual users are few and busy; don't let the per-user limiter dominate the results
+        defaults["USER_RATE_LIMIT_PER_MINUTE"] = "1000000"
+        defaults["USER_RATE_LIMIT_BURST"] = "1000000"
+        defaults["IP_RATE_LIMIT_PER_MINUTE"] = "1000000"
+        defaults["IP_RATE_LIMIT_BURST"] = "1000000"
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the API")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between scenarios (s)")
+    parser.add_argument("--mix", help="scenario weights, e.g. mock_test=3,evaluate=1 (default: all)")
+    parser.add_argument("--unique-ratio", type=float, default=0.2, help="fraction of never-seen topics (cache misses)")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5", help="fake OpenAI latency spec")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake OpenAI 5xx fraction")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fake OpenAI 429 fraction")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="fake OpenAI unparseable fraction")
+    parser.add_argument("--lemonfox-latency", default="lognormal:0.4:0.4")
+    parser.add_argument("--storage", choices=["firestore", "sqlite", "memory"], default="firestore",
+                        help="result store backend (firestore = fake Firestore)")
+    parser.add_argument("--firestore-rtt", type=float, default=0.02)
+    parser.add_argument("--keep-user-limits", action="store_true", help="keep the per-user and per-IP rate limit defaults")
+    parser.add_argument("--target", help="drive an already running server instead of the local stack")
+    parser.add_argument("--save", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    parser.add_argument("--min-samples", type=int, default=20, help="requests needed before an endpoint is judged")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="show the app's own logging during the run")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    weights = parse_mix(args.mix)
+
+    if args.target:
+        samples, elapsed = asyncio.run(run_load(args.target, args.users, args.duration, weights, args.unique_ratio, args.think))
+    else:
+        import fake_lemonfox
+        import fake_openai
+        from fake_firestore import FakeFirestore
+
+        with tempfile.TemporaryDirectory() as workdir:
+            configure_local_env(args, workdir)
+            import firebase_utils
+            import main as app_main
+
+            firebase_utils.get_db = lambda db=FakeFirestore(rtt=args.firestore_rtt): db
+            firebase_utils.verify_id_token = lambda token: token
+            openai_app = fake_openai.create_app(args.latency, args.error_rate, args.rate_limit_rate, args.garbage_rate)
+            lemonfox_app = fake_lemonfox.create_app(args.lemonfox_latency)
+            # The app logs every generated question; keep it out of the report unless asked
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+            with quiet, fake_openai.BackgroundServer(openai_app, OPENAI_PORT), \
+                    fake_openai.BackgroundServer(lemonfox_app, LEMONFOX_PORT), \
+                    fake_openai.BackgroundServer(app_main.app, APP_PORT):
+                samples, elapsed = asyncio.run(run_load(
+                    f"http://127.0.0.1:{APP_PORT}", args.users, args.duration, weights, args.unique_ratio, args.think
+                ))
+            print(f"\nFake OpenAI: {openai_app.state.faults.stats}")
+
+    report = summarize(samples, elapsed)
+    report["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": git_revision(),
+        "elapsed_seconds": round(elapsed, 2),
+        "args": vars(args),
+        "mix": weights,
+    }
+    print()
+    print_report(report)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold, args.min_samples):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
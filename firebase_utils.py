@@ -1,19 +1,68 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import sys
 import json
+import base64
+import threading
+import uuid
 from datetime import datetime
+from typing import Any, Dict, Optional
+
+from metrics import track_upstream
+from resilience import get_policy
+from ttl_cache import TTLCache
+
+# firebase_admin is imported inside the functions below: it is one of the heaviest
+# imports in the app and only the persistence paths need it.
+
+CRED_PATH = "serviceAccountKey.json"
+
+# Fields the dashboard needs; reads project to these so documents stay small
+PROFILE_FIELDS = [
+    "totalTests", "testScoreSum", "averageScore", "interviewCount",
+    "interviewHours", "streakDays", "joinedAt", "lastActive",
+]
+ACTIVITY_FIELDS = ["type", "topic", "difficulty", "score", "total_questions", "feedback_summary", "timestamp", "date_str"]
+
+# Short-TTL per-user read cache, invalidated by the save_* functions.
+# Entry per user: {"profile": ..., ("activities", limit, cursor): ...}
+_read_cache = TTLCache(
+    max_entries=int(os.getenv("USER_READ_CACHE_MAX_USERS", "1000")),
+    ttl=float(os.getenv("USER_READ_CACHE_TTL_SECONDS", "30")),
+)
+_read_cache_lock = threading.Lock()
+# user_id -> [loads in flight, invalidations since the first of them started].
+# A load that sees an invalidation happen underneath it doesn't cache its result.
+_loads: Dict[str, list] = {}
+
+
+def is_configured() -> bool:
+    return bool(os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")) or os.path.exists(CRED_PATH)
+
+
+def is_initialized() -> bool:
+    firebase_admin = sys.modules.get("firebase_admin")
+    if firebase_admin is None:
+        return False
+    try:
+        firebase_admin.get_app()
+        return True
+    except ValueError:
+        return False
+
 
 # Initialize Firebase Admin
 # We expect a serviceAccountKey.json file or an environment variable with the JSON content
 def initialize_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+
     try:
         # Check if app is already initialized
         firebase_admin.get_app()
     except ValueError:
         # 1. Try Environment Variable (Production/Railway)
         env_creds = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-        cred_path = "serviceAccountKey.json"
+        cred_path = CRED_PATH
         
         if env_creds:
             try:
@@ -33,19 +82,217 @@ def initialize_firebase():
         else:
             print("Warning: No Firebase credentials found (checked Env Var and local file). Database writes will fail.")
 
-def save_test_result(user_id: str, topic: str, difficulty: str, score: float, total_questions: int):
+def get_db():
     """
-    Saves a mock test result to Firestore and updates user aggregates.
+    Returns the Firestore client, initialising Firebase on first use.
     """
+    import firebase_admin
+    from firebase_admin import firestore
+
     # Ensure Firebase is initialized (Lazy load for robustness)
     try:
         firebase_admin.get_app()
     except ValueError:
         initialize_firebase()
+    return firestore.client()
+
+
+def verify_id_token(token: str) -> Optional[str]:
+    """
+    uid of a valid Firebase ID token, or None if it is malformed, expired or revoked.
+    Raises if Firebase isn't configured or the signing keys can't be fetched.
+    """
+    import firebase_admin
+    from firebase_admin import auth
+
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        initialize_firebase()
+    if not is_initialized():
+        raise RuntimeError("Firebase is not configured")
+    try:
+        return auth.verify_id_token(token)["uid"]
+    except (ValueError, auth.InvalidIdTokenError, auth.UserDisabledError):
+        return None
+
+
+def average_score(profile: dict) -> float:
+    """
+    Mock test average for a user profile, derived from testScoreSum/totalTests.
+    Profiles that predate testScoreSum fall back to the stored averageScore;
+    recompute_stats.py backfills testScoreSum for them once.
+    """
+    total = profile.get("totalTests", 0)
+    if "testScoreSum" in profile:
+        return profile["testScoreSum"] / total if total else 0
+    return profile.get("averageScore", 0)
+
+
+def invalidate_user_cache(user_id: str):
+    with _read_cache_lock:
+        _read_cache.pop(user_id)
+        state = _loads.get(user_id)
+        if state is not None:
+            state[1] += 1
+
+
+def _cached_read(user_id: str, key: Any, load):
+    with _read_cache_lock:
+        entry = _read_cache.get(user_id)
+        if entry is not None and key in entry:
+            return entry[key]
+        state = _loads.setdefault(user_id, [0, 0])
+        state[0] += 1
+        version = state[1]
+    loaded = False
+    try:
+        value = load()
+        loaded = True
+    finally:
+        with _read_cache_lock:
+            state[0] -= 1
+            if state[0] == 0:
+                del _loads[user_id]
+            # A save landed while loading: the result may predate it, so serve it uncached
+            if loaded and state[1] == version:
+                entry = _read_cache.get(user_id)
+                if entry is None:
+                    entry = {}
+                    _read_cache.set(user_id, entry)
+                entry[key] = value
+    return value
+
+
+def _serialize(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Firestore timestamps -> ISO strings for JSON responses
+    return {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in data.items()}
+
+
+def encode_cursor(timestamp: datetime, doc_id: str) -> str:
+    raw = json.dumps({"ts": timestamp.isoformat(), "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return {"ts": datetime.fromisoformat(data["ts"]), "id": data["id"]}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_profile(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Dashboard profile (projected fields + derived averageScore). One document read, cached briefly.
+    """
+    def attempt(timeout: float):
+        with track_upstream("firestore", "get_profile"):
+            return get_db().collection("users").document(user_id).get(
+                field_paths=PROFILE_FIELDS, retry=None, timeout=timeout
+            )
+
+    def load():
+        doc = get_policy("firestore").call_sync(attempt)
+        if not doc.exists:
+            return None
+        profile = doc.to_dict()
+        profile["averageScore"] = average_score(profile)
+        return _serialize(profile)
+
+    return _cached_read(user_id, "profile", load)
+
+
+def list_activities(user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a user's activities, newest first.
+    Costs at most `limit` document reads regardless of how long the history is.
+    """
+    def load():
+        from firebase_admin import firestore
+
+        user_ref = get_db().collection("users").document(user_id)
+        activities = user_ref.collection("activities")
+        query = (
+            activities
+            .order_by("timestamp", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+            .select(ACTIVITY_FIELDS)
+            .limit(limit)
+        )
+        if cursor:
+            position = decode_cursor(cursor)
+            query = query.start_after({"timestamp": position["ts"], "__name__": activities.document(position["id"])})
+
+        def attempt(timeout: float):
+            with track_upstream("firestore", "list_activities"):
+                return list(query.stream(retry=None, timeout=timeout))
+
+        docs = get_policy("firestore").call_sync(attempt)
+        items = []
+        for doc in docs:
+            items.append({"id": doc.id, **_serialize(doc.to_dict())})
+        next_cursor = None
+        if len(docs) == limit and docs[-1].to_dict().get("timestamp"):
+            next_cursor = encode_cursor(docs[-1].to_dict()["timestamp"], docs[-1].id)
+        return {"items": items, "next_cursor": next_cursor}
+
+    return _cached_read(user_id, ("activities", limit, cursor), load)
+
+
+def _save_result(user_id: str, activity_id: Optional[str], activity_data: Dict[str, Any], profile_update: Dict[str, Any], operation: str):
+    """
+    Creates the activity and merges profile_update into the profile in one batch:
+    a single commit RPC and no read. Aggregates must be server-side transforms
+    (Increment/Maximum) so concurrent saves never overwrite each other.
+    """
+    from google.api_core.exceptions import AlreadyExists
+
+    db = get_db()
+    user_ref = db.collection("users").document(user_id)
+    batch = db.batch()
+    batch.create(user_ref.collection("activities").document(activity_id or uuid.uuid4().hex), activity_data)
+    batch.set(user_ref, profile_update, merge=True)
+
+    def attempt(timeout: float):
+        with track_upstream("firestore", operation):
+            batch.commit(retry=None, timeout=timeout)
+
+    # The activity document has a fixed id, so a retry of a commit that already
+    # landed (e.g. after an ambiguous timeout) fails atomically with AlreadyExists
+    # instead of applying the result twice.
+    try:
+        get_policy("firestore").call_sync(attempt)
+    except AlreadyExists:
+        print(f"DEBUG: {operation} was already applied, skipping")
+
+
+def _profile_defaults() -> Dict[str, Any]:
+    """
+    Transforms that bring a new profile's fields into existence without touching
+    existing values. joinedAt has no such transform; recompute_stats.py fills it in.
+    """
+    from firebase_admin import firestore
+
+    return {
+        "totalTests": firestore.Increment(0), "testScoreSum": firestore.Increment(0),
+        "interviewCount": firestore.Increment(0), "interviewHours": firestore.Increment(0),
+        "streakDays": firestore.Maximum(1), "lastActive": firestore.SERVER_TIMESTAMP,
+    }
+
+
+def save_test_result(
+    user_id: str, topic: str, difficulty: str, score: float, total_questions: int,
+    activity_id: Optional[str] = None
+):
+    """
+    Saves a mock test result to Firestore and updates user aggregates.
+    The activity and the aggregates are written in one batch (single commit, no read).
+    Passing the same activity_id again is a no-op, which makes retries safe.
+    """
+    from firebase_admin import firestore
 
     try:
-        db = firestore.client()
-        
         # 1. Save detailed activity
         activity_data = {
             "type": "mock_test",
@@ -56,58 +303,32 @@ def save_test_result(user_id: str, topic: str, difficulty: str, score: float, to
             "timestamp": firestore.SERVER_TIMESTAMP,
             "date_str": datetime.now().strftime("%Y-%m-%d %H:%M")
         }
-        
-        # Add to subcollection
-        print(f"DEBUG: Saving Activity to users/{user_id}/activities")
-        db.collection("users").document(user_id).collection("activities").add(activity_data)
-        
+
         # 2. Update Aggregates (Profile)
-        user_ref = db.collection("users").document(user_id)
-        doc = user_ref.get()
-        
-        if doc.exists:
-            data = doc.to_dict()
-            current_total = data.get("totalTests", 0)
-            current_avg = data.get("averageScore", 0)
-            
-            # Calculate new average
-            new_total = current_total + 1
-            # Score is already percentage from frontend
-            new_avg = ((current_avg * current_total) + score) / new_total
-            
-            user_ref.update({
-                "totalTests": new_total,
-                "averageScore": new_avg,
-                "lastActive": firestore.SERVER_TIMESTAMP
-            })
-        else:
-            # Create new user profile if not exists
-            user_ref.set({
-                "totalTests": 1,
-                "averageScore": score,
-                "interviewCount": 0,
-                "interviewHours": 0,
-                "streakDays": 1,
-                "joinedAt": firestore.SERVER_TIMESTAMP
-            })
+        # testScoreSum/totalTests are the source of truth; averageScore is derived on
+        # read (and refreshed by recompute_stats.py). Score is already percentage from frontend.
+        profile_update = _profile_defaults()
+        profile_update.update({
+            "totalTests": firestore.Increment(1),
+            "testScoreSum": firestore.Increment(score),
+        })
+
+        print(f"DEBUG: Saving Activity to users/{user_id}/activities")
+        _save_result(user_id, activity_id, activity_data, profile_update, "save_test_result")
+        invalidate_user_cache(user_id)
         print("DEBUG: Successfully saved test result to Firestore")
     except Exception as e:
         print(f"CRITICAL ERROR Saving to Firestore: {e}")
         raise e
 
-def save_interview_result(user_id: str, topic: str, difficulty: str, feedback: dict):
+def save_interview_result(user_id: str, topic: str, difficulty: str, feedback: dict, activity_id: Optional[str] = None):
     """
     Saves an interview result. 
     Feedback is the JSON object from the AI evaluator.
     """
-    # Ensure Firebase is initialized
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        initialize_firebase()
+    from firebase_admin import firestore
 
     try:
-        db = firestore.client()
         overall_score = feedback.get("overall_score", 0)
         
         activity_data = {
@@ -119,31 +340,16 @@ def save_interview_result(user_id: str, topic: str, difficulty: str, feedback: d
             "timestamp": firestore.SERVER_TIMESTAMP,
             "date_str": datetime.now().strftime("%Y-%m-%d %H:%M")
         }
-        
-        print(f"DEBUG: Saving Interview to users/{user_id}/activities")
-        db.collection("users").document(user_id).collection("activities").add(activity_data)
-        
+
         # Update aggregates
-        # Update aggregates with average score recalculation
-        user_ref = db.collection("users").document(user_id)
-        doc = user_ref.get()
-        
-        updates = {
-            "interviewCount": firestore.Increment(1),
-            "lastActive": firestore.SERVER_TIMESTAMP
-        }
+        # "averageScore" stays a Mock Test metric (interviews are subjective, 0-100 but
+        # diff criteria), so only interviewCount is incremented here.
+        profile_update = _profile_defaults()
+        profile_update["interviewCount"] = firestore.Increment(1)
 
-        if doc.exists:
-            data = doc.to_dict()
-            current_total_tests = data.get("totalTests", 0) # We might want to track separate interview avg? 
-            # For now, let's keep "averageScore" as a global metric for both tests and interviews?
-            # Or usually "Average Score" on dashboard means "Quiz Score". 
-            # I will Leave Average Score ONLY for Mock Tests to avoid confusing the user, 
-            # as interviews are subjective (0-100 but diff criteria).
-            # So I will ONLY increment interviewCount here.
-            pass
-        
-        user_ref.update(updates)
+        print(f"DEBUG: Saving Interview to users/{user_id}/activities")
+        _save_result(user_id, activity_id, activity_data, profile_update, "save_interview_result")
+        invalidate_user_cache(user_id)
         print("DEBUG: Successfully saved Interview result")
     except Exception as e:
         print(f"CRITICAL ERROR Saving Interview: {e}")
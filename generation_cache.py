@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from Schema_and_prompts import MockTest, InterviewSession, Mock_test_prompt, Mock_interview_prompt
+from shared_state import SharedState, get_shared_state, shared_state_path
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Content-addressed cache for generated question sets.
+# Keys cover the normalised topic/difficulty, the model and a fingerprint of the
+# prompt + response schema, so editing Schema_and_prompts.py invalidates old
+# entries without any manual flush.
+
+PROMPTS = {
+    "mock_test": (Mock_test_prompt, MockTest),
+    "interview": (Mock_interview_prompt, InterviewSession),
+}
+
+
+def prompt_fingerprint(kind: str) -> str:
+    prompt, schema = PROMPTS[kind]
+    payload = prompt + json.dumps(schema.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class SQLiteTier:
+    """
+    Optional on-disk tier so cached sets survive restarts.
+    Calls are blocking and are run via asyncio.to_thread by GenerationCache.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation_cache ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def purge_stale(self, fingerprints: Dict[str, str]):
+        """Drops expired rows and rows generated with an older prompt/schema."""
+        with self._lock:
+            self._conn.execute("DELETE FROM generation_cache WHERE expires_at < ?", (time.time(),))
+            for kind, fingerprint in fingerprints.items():
+                self._conn.execute(
+                    "DELETE FROM generation_cache WHERE kind = ? AND fingerprint != ?", (kind, fingerprint)
+                )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM generation_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, kind: str, fingerprint: str, value: Any, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, kind, fingerprint, value, expires_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, kind, fingerprint, json.dumps(value), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GenerationCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 86400.0,
+        db_path: Optional[str] = None,
+        shared: Optional[SharedState] = None
+    ):
+        self.ttl = ttl
+        # Multi-worker mode: misses are coalesced across processes through a lease,
+        # and the result is handed over through the (shared) SQLite tier
+        self.shared = shared if db_path else None
+        self.memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.fingerprints = {kind: prompt_fingerprint(kind) for kind in PROMPTS}
+        self.disk: Optional[SQLiteTier] = None
+        if db_path:
+            self.disk = SQLiteTier(db_path)
+            self.disk.purge_stale(self.fingerprints)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def make_key(self, kind: str, topic: str, difficulty: str, model: str) -> str:
+        parts = [kind, normalize(topic), normalize(difficulty), model, self.fingerprints[kind]]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.stats["disk_hits"] += 1
+                self.memory.set(key, value)
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, kind: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, kind, self.fingerprints[kind], value, self.ttl)
+        self.stats["stores"] += 1
+
+    async def get_or_generate(
+        self,
+        kind: str,
+        topic: str,
+        difficulty: str,
+        model: str,
+        generate: Callable[[], Awaitable[List[dict]]],
+        single_flight: Optional[SingleFlight] = None,
+        wait_timeout: Optional[float] = None
+    ) -> List[dict]:
+        """
+        Returns the cached set or generates and stores it. With `single_flight`,
+        concurrent misses on the same key share one generate() call.
+        """
+        key = self.make_key(kind, topic, difficulty, model)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        async def produce() -> List[dict]:
+            value = await generate()
+            if not value:
+                raise ValueError(f"Model {model} returned no {kind} questions")
+            await self.set(key, kind, value)
+            return value
+
+        async def peek() -> Optional[List[dict]]:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+            return value
+
+        if self.shared is not None:
+            local_produce = produce
+
+            async def produce() -> List[dict]:
+                return await self.shared.coalesce(
+                    f"generation:{key}", local_produce, peek, wait_timeout or self.shared.lease_ttl
+                )
+
+        if single_flight is None:
+            return await produce()
+        return await single_flight.do(key, produce, timeout=wait_timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None,
+            "shared_across_workers": self.shared is not None,
+            "fingerprints": self.fingerprints,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> GenerationCache:
+    global _cache
+    if _cache is None:
+        _cache = GenerationCache(
+            max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "512")),
+            ttl=float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "86400")),
+            # With several workers the disk tier defaults to the shared state file
+            db_path=os.getenv("GENERATION_CACHE_DB") or shared_state_path(),
+            shared=get_shared_state(),
+        )
+    return _cache
+
+
+def close_generation_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
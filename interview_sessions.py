@@ -0,0 +1,202 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from mock_interview import aevaluate_answer, aggregate_feedbacks
+from shared_state import SharedState, get_shared_state
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Server-side interview sessions.
+# Each answer is evaluated in the background as soon as it is submitted, so the
+# final /api/evaluate-interview call only waits for whatever is still running
+# and then aggregates. Sessions live in a bounded TTL store; evicting a session
+# cancels its outstanding evaluations.
+# With several workers the session metadata and each finished per-answer
+# feedback are also written to the shared state, so finalize on any worker
+# reuses evaluations done elsewhere; only answers no worker evaluated (or that
+# were changed since) are evaluated at finalize time.
+
+
+class InterviewSessionState:
+    def __init__(self, topic: str, difficulty: str, user_id: str, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.topic = topic
+        self.difficulty = difficulty
+        self.user_id = user_id
+        self.created_at = time.time()
+        self.answers: Dict[int, Dict[str, Any]] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    def pending(self) -> int:
+        return sum(1 for task in self.tasks.values() if not task.done())
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+
+def _cancel_evicted(session_id: str, session: InterviewSessionState):
+    print(f"Interview session {session_id} expired; cancelling {session.pending()} evaluations")
+    session.cancel()
+
+
+class InterviewSessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600.0, shared: Optional[SharedState] = None):
+        self.ttl = ttl
+        self.shared = shared
+        self._sessions = TTLCache(max_entries=max_sessions, ttl=ttl, on_evict=_cancel_evicted)
+
+    async def create(self, topic: str, difficulty: str, user_id: str = "anonymous") -> InterviewSessionState:
+        self._sessions.purge_expired()
+        session = InterviewSessionState(topic, difficulty, user_id)
+        self._sessions.set(session.session_id, session)
+        if self.shared is not None:
+            # Shared state calls are SQLite transactions: keep them off the event loop
+            try:
+                await asyncio.to_thread(
+                    self.shared.set_json,
+                    f"interview_session:{session.session_id}",
+                    {"topic": topic, "difficulty": difficulty, "user_id": user_id}, self.ttl,
+                )
+            except sqlite3.OperationalError as e:
+                print(f"Warning: could not share interview session {session.session_id}: {e}")
+        return session
+
+    async def get(self, session_id: str) -> Optional[InterviewSessionState]:
+        session = self._sessions.get(session_id)
+        if session is None and self.shared is not None:
+            # Created by another worker
+            meta = await asyncio.to_thread(self.shared.get_json, f"interview_session:{session_id}")
+            # Another request may have picked it up while we were reading
+            session = self._sessions.get(session_id)
+            if session is None and meta is not None:
+                session = InterviewSessionState(meta["topic"], meta["difficulty"], meta["user_id"], session_id)
+                self._sessions.set(session_id, session)
+        return session
+
+    def submit_answer(self, session: InterviewSessionState, item: Dict[str, Any]):
+        """
+        Records an answer and starts evaluating it right away.
+        Re-submitting the same question replaces the earlier answer and its evaluation.
+        """
+        question_id = item["question_id"]
+        previous = session.tasks.get(question_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        session.answers[question_id] = item
+        task = asyncio.create_task(self._evaluate(session, item))
+        # Failures are surfaced (and retried) in finalize; don't log them as unhandled here
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        session.tasks[question_id] = task
+
+    @staticmethod
+    def _feedback_key(session_id: str, question_id: int) -> str:
+        return f"interview_feedback:{session_id}:{question_id}"
+
+    async def _evaluate(self, session: InterviewSessionState, item: Dict[str, Any]) -> Dict[str, Any]:
+        feedback = await aevaluate_answer(session.topic, session.difficulty, item)
+        if self.shared is not None:
+            # Stored with the answer it grades, so a later re-submission doesn't reuse it
+            try:
+                await asyncio.to_thread(
+                    self.shared.set_json, self._feedback_key(session.session_id, item["question_id"]),
+                    {"item": item, "feedback": feedback}, self.ttl,
+                )
+            except sqlite3.OperationalError as e:
+                print(f"Warning: could not share feedback for Q{item['question_id']}: {e}")
+        return feedback
+
+    async def _shared_feedback(self, session: InterviewSessionState, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.shared is None:
+            return None
+        try:
+            stored = await asyncio.to_thread(
+                self.shared.get_json, self._feedback_key(session.session_id, item["question_id"])
+            )
+        except sqlite3.OperationalError:
+            return None
+        if stored is None or stored["item"] != item:
+            return None
+        return stored["feedback"]
+
+    async def _feedback_for(self, session: InterviewSessionState, item: Dict[str, Any]) -> Dict[str, Any]:
+        question_id = item["question_id"]
+        task = session.tasks.get(question_id)
+        if task is not None and session.answers.get(question_id) == item:
+            try:
+                return await task
+            except asyncio.CancelledError:
+                # Only swallow the background task's own cancellation, never ours
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                print(f"Background evaluation of Q{question_id} failed, retrying: {e}")
+        else:
+            # Possibly evaluated by the worker that received the answer
+            feedback = await self._shared_feedback(session, item)
+            if feedback is not None:
+                return feedback
+        return await aevaluate_answer(session.topic, session.difficulty, item)
+
+    async def finalize(self, session: InterviewSessionState, qa_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Waits for outstanding per-answer evaluations (evaluating any answer the
+        session hasn't seen yet) and aggregates them into an InterviewEvaluation dict.
+        """
+        feedbacks = await asyncio.gather(*(self._feedback_for(session, item) for item in qa_list))
+        evaluation = await aggregate_feedbacks(session.topic, session.difficulty, list(feedbacks))
+        self._sessions.pop(session.session_id)
+        if self.shared is not None:
+            keys = [f"interview_session:{session.session_id}"]
+            keys += [self._feedback_key(session.session_id, item["question_id"]) for item in qa_list]
+
+            def forget():
+                for key in keys:
+                    self.shared.delete(key)
+
+            try:
+                await asyncio.to_thread(forget)
+            except sqlite3.OperationalError:
+                pass # expires with its TTL
+        return evaluation
+
+    def close(self):
+        for session in self._sessions.values():
+            session.cancel()
+        self._sessions.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        sessions = self._sessions.values()
+        return {
+            "sessions": len(sessions),
+            "pending_evaluations": sum(s.pending() for s in sessions),
+            "ttl_seconds": self.ttl,
+        }
+
+
+_store: Optional[InterviewSessionStore] = None
+
+
+def get_session_store() -> InterviewSessionStore:
+    global _store
+    if _store is None:
+        _store = InterviewSessionStore(
+            max_sessions=int(os.getenv("INTERVIEW_SESSION_MAX", "1000")),
+            ttl=float(os.getenv("INTERVIEW_SESSION_TTL_SECONDS", "3600")),
+            shared=get_shared_state(),
+        )
+    return _store
+
+
+def close_session_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
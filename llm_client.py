@@ -0,0 +1,145 @@
+import os
+from typing import AsyncIterator, List, Dict, Optional, Type, TypeVar, TYPE_CHECKING
+
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+from admission import get_limiter
+from metrics import record_llm_usage, track_upstream
+from resilience import get_policy
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+load_dotenv()
+
+T = TypeVar("T", bound=BaseModel)
+
+DEFAULT_MODEL = "gpt-4o"
+
+# One AsyncOpenAI client (and one httpx connection pool) per worker process.
+# It is created by the startup warm-up (see app_lifecycle) and shared by mock_test and mock_interview
+# so concurrent requests reuse keep-alive connections instead of opening new ones.
+# The openai/httpx imports are deferred to first use to keep cold start fast.
+_client: Optional["AsyncOpenAI"] = None
+
+
+def is_configured() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def is_initialized() -> bool:
+    return _client is not None
+
+
+def create_async_client() -> "AsyncOpenAI":
+    """
+    Builds the pooled AsyncOpenAI client from environment configuration.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+
+    import httpx
+    from openai import AsyncOpenAI
+
+    max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(get_policy("openai").timeout, connect=10.0),
+    )
+    # OPENAI_BASE_URL is honoured by the SDK itself (used to point at a fake upstream).
+    # SDK retries are off: retries, deadlines and the circuit breaker live in resilience.py.
+    return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def init_async_client() -> "AsyncOpenAI":
+    """
+    Creates the shared client. Called from the startup warm-up, or lazily on first use.
+    """
+    global _client
+    if _client is None:
+        _client = create_async_client()
+    return _client
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Returns the shared client, creating it on first use (e.g. in scripts without a lifespan).
+    """
+    if _client is None:
+        return init_async_client()
+    return _client
+
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def parse_completion(
+    messages: List[Dict[str, str]],
+    response_format: Type[T],
+    model: str = "gpt-4o",
+    operation: str = "parse",
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None
+) -> T:
+    """
+    Runs a structured-output chat completion on the shared client and returns the parsed model.
+    operation/topic/difficulty only label the latency and token metrics.
+    """
+    client = get_async_client()
+
+    async def attempt():
+        with track_upstream("openai", operation):
+            return await client.chat.completions.parse(
+                model=model,
+                messages=messages,
+                response_format=response_format,
+            )
+
+    # Admission slot is held across retries so backoff doesn't let extra calls in
+    async with get_limiter("openai").slot():
+        completion = await get_policy("openai").call(attempt)
+    record_llm_usage(model, completion.usage, operation, topic, difficulty)
+    parsed = completion.choices[0].message.parsed
+    if parsed is None:
+        raise ValueError(f"Model {model} returned no parsable {response_format.__name__}")
+    return parsed
+
+
+async def stream_content(
+    messages: List[Dict[str, str]],
+    response_format: Type[BaseModel],
+    model: str = "gpt-4o",
+    operation: str = "stream",
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Streams a structured-output chat completion, yielding the raw JSON content deltas.
+    The latency metric covers the whole stream; usage arrives in the final chunk.
+    Streams go through the circuit breaker but are not retried.
+    """
+    client = get_async_client()
+    usage = None
+    async with get_limiter("openai").slot():
+        with get_policy("openai").guard(), track_upstream("openai", operation):
+            async with client.chat.completions.stream(
+                model=model,
+                messages=messages,
+                response_format=response_format,
+                stream_options={"include_usage": True},
+            ) as stream:
+                async for event in stream:
+                    if event.type == "content.delta":
+                        yield event.delta
+                    elif event.type == "chunk" and event.chunk.usage is not None:
+                        usage = event.chunk.usage
+    record_llm_usage(model, usage, operation, topic, difficulty)
@@ -1,13 +1,45 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from mock_test import generate_mock_test_questions
+from contextlib import asynccontextmanager
+from question_service import (
+    get_mock_test,
+    get_interview_questions,
+    get_question_pools,
+    stream_mock_test,
+    stream_interview_questions,
+)
+from question_stream import sse_event
+from generation_cache import get_generation_cache
+from single_flight import get_single_flight
+from model_router import get_model_router
+from resilience import CircuitOpenError, UpstreamStatusError, get_policies
+import admission
+from admission import AdmissionError
+import asyncio
+import hmac
+import uuid
+import app_lifecycle
+import metrics
+import tts_and_stt
+from audio_cache import cache_while_streaming, get_audio_cache
+from audio_presynth import get_presynthesizer
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients (OpenAI, Firebase, Lemonfox) are created lazily / by a background warm-up
+    await app_lifecycle.startup()
+    yield
+    await app_lifecycle.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -17,17 +49,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latency/error histograms per route template, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
 
 class TopicRequest(BaseModel):
     topic: str
     difficulty: str = "Medium"
 
-from mock_interview import generate_interview_questions, evaluate_interview
-from typing import List, Dict, Any
+from mock_interview import aevaluate_interview, aevaluate_interview_parallel
+from interview_sessions import get_session_store
+from typing import List, Dict, Any, Optional
+
+def _rejected(e: Exception) -> HTTPException:
+    # Circuit open / over capacity (503) or rate limited (429): fail fast and say when to come back
+    return HTTPException(status_code=getattr(e, "status_code", 503), detail=str(e), headers=admission.retry_after_header(e))
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, e: AdmissionError):
+    return JSONResponse({"detail": str(e)}, status_code=e.status_code, headers=admission.retry_after_header(e))
+
+async def admit_user(http_request: Request, user_id: Optional[str] = None):
+    # Per-user token bucket for the LLM endpoints (user_id, else X-User-Id, else client IP),
+    # plus the client IP's bucket when a user id was given
+    try:
+        await admission.acheck_client(
+            user_id,
+            http_request.headers.get("x-user-id"),
+            http_request.client.host if http_request.client else None,
+        )
+    except AdmissionError as e:
+        raise _rejected(e)
 
 class InterviewRequest(BaseModel):
     topic: str
     difficulty: str = "Medium"
+    presynthesize: bool = False # start TTS for every question in the background
+    voice: str = "sarah"
 
 class QAItem(BaseModel):
     question_id: int
@@ -39,55 +96,346 @@ class EvaluationRequest(BaseModel):
     difficulty: str
     qa_list: List[QAItem]
     user_id: str = "anonymous" # Optional for backward compatibility
+    mode: Optional[str] = None # "single" (one call) or "parallel" (per-question fan-out); defaults to EVALUATION_MODE
+    session_id: Optional[str] = None # From /api/interview-session; answers already evaluated in the background
+
+class InterviewSessionRequest(BaseModel):
+    topic: str
+    difficulty: str = "Medium"
+    user_id: str = "anonymous"
 
 @app.post("/api/generate-mock-test")
-async def generate_test(request: TopicRequest):
+async def generate_test(request: TopicRequest, http_request: Request):
+    await admit_user(http_request)
     try:
         print(f"Generating test for topic: {request.topic}, Difficulty: {request.difficulty}")
-        questions = generate_mock_test_questions(request.topic, request.difficulty)
+        questions = await get_mock_test(request.topic, request.difficulty)
         return {"questions": questions}
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for question generation")
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
     except Exception as e:
         print(f"Error generating test: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/generate-interview")
-async def generate_interview(request: InterviewRequest):
+async def generate_interview(request: InterviewRequest, http_request: Request):
+    await admit_user(http_request)
     try:
         print(f"Generating INTERVIEW for topic: {request.topic}, Difficulty: {request.difficulty}")
-        questions = generate_interview_questions(request.topic, request.difficulty)
+        questions = await get_interview_questions(request.topic, request.difficulty)
+        if request.presynthesize and get_audio_cache() is not None:
+            session = await get_presynthesizer().start(questions, request.voice)
+            return {
+                "questions": questions,
+                "audio_session_id": session.session_id,
+                "audio_expires_in": get_presynthesizer().ttl,
+            }
         return {"questions": questions}
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for question generation")
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
     except Exception as e:
         print(f"Error generating interview: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _sse_questions(questions):
+    # One `question` event per validated question, then `done` (or `error`)
+    count = 0
+    try:
+        async for question in questions:
+            count += 1
+            yield sse_event("question", question)
+        yield sse_event("done", {"count": count})
+    except Exception as e:
+        print(f"Error streaming questions: {e}")
+        yield sse_event("error", {"detail": str(e), "count": count})
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/api/generate-mock-test/stream")
+async def generate_test_stream(request: TopicRequest, http_request: Request):
+    await admit_user(http_request)
+    print(f"Streaming test for topic: {request.topic}, Difficulty: {request.difficulty}")
+    return StreamingResponse(
+        _sse_questions(stream_mock_test(request.topic, request.difficulty)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@app.post("/api/generate-interview/stream")
+async def generate_interview_stream(request: InterviewRequest, http_request: Request):
+    await admit_user(http_request)
+    print(f"Streaming INTERVIEW for topic: {request.topic}, Difficulty: {request.difficulty}")
+    return StreamingResponse(
+        _sse_questions(stream_interview_questions(request.topic, request.difficulty)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@app.post("/api/interview-session")
+async def start_interview_session(request: InterviewSessionRequest):
+    session = await get_session_store().create(request.topic, request.difficulty, request.user_id)
+    return {"session_id": session.session_id, "expires_in": get_session_store().ttl}
+
+@app.post("/api/interview-session/{session_id}/answer")
+async def submit_interview_answer(session_id: str, item: QAItem, http_request: Request):
+    store = get_session_store()
+    session = await store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Interview session not found or expired")
+    await admit_user(http_request, session.user_id)
+    store.submit_answer(session, item.dict())
+    return {"status": "accepted", "question_id": item.question_id, "pending": session.pending()}
+
 @app.post("/api/evaluate-interview")
-async def evaluate_interview_endpoint(request: EvaluationRequest):
+async def evaluate_interview_endpoint(request: EvaluationRequest, http_request: Request):
+    await admit_user(http_request, request.user_id)
     try:
         print(f"Evaluating Interview for topic: {request.topic}")
         # Convert Pydantic models to dicts
         qa_list_dicts = [item.dict() for item in request.qa_list]
-        evaluation = evaluate_interview(request.topic, request.difficulty, qa_list_dicts)
+        mode = request.mode or os.getenv("EVALUATION_MODE", "single")
+        session = await get_session_store().get(request.session_id) if request.session_id else None
+        if session is not None:
+            evaluation = await get_session_store().finalize(session, qa_list_dicts)
+        elif mode == "parallel":
+            evaluation = await aevaluate_interview_parallel(request.topic, request.difficulty, qa_list_dicts)
+        else:
+            evaluation = await aevaluate_interview(request.topic, request.difficulty, qa_list_dicts)
         
         # Save to Firebase if user_id is provided
         if request.user_id and request.user_id != "anonymous":
             try:
-                save_interview_result(request.user_id, request.topic, request.difficulty, evaluation)
+                await get_write_queue().submit("mock_interview", {
+                    "activity_id": uuid.uuid4().hex, # idempotency key for retries
+                    "user_id": request.user_id,
+                    "topic": request.topic,
+                    "difficulty": request.difficulty,
+                    "feedback": evaluation,
+                })
             except Exception as e:
                 print(f"Failed to save interview result: {e}")
                 
         return evaluation
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
     except Exception as e:
         print(f"Error evaluating interview: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "4096"))
+
+class TTSRequest(BaseModel):
+    text: str
+    voice: str = "sarah"
+    response_format: str = "mp3"
+
+AUDIO_JOIN_WAIT_SECONDS = float(os.getenv("AUDIO_PRESYNTH_WAIT_SECONDS", "30"))
+
+async def _speech_response(text: str, voice: str, response_format: str, http_request: Request):
+    # Cached audio is served from disk; audio still being pre-synthesized is awaited;
+    # anything else is synthesized live and streamed while it is copied into the cache
+    cache = get_audio_cache()
+    if cache is not None:
+        key = cache.make_key(text, voice, response_format)
+        await get_presynthesizer().join(key, AUDIO_JOIN_WAIT_SECONDS)
+        path = cache.lookup(key, response_format)
+        if path is not None:
+            return FileResponse(path, media_type=tts_and_stt.MEDIA_TYPES[response_format], headers={"X-Cache": "HIT"})
+    await admit_user(http_request)
+    try:
+        # Returns once the first audio byte is in; the rest is relayed chunk by chunk
+        stream = await tts_and_stt.open_speech_stream(text, voice, response_format)
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
+    except UpstreamStatusError as e:
+        print(f"Error synthesizing speech: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        print(f"Error synthesizing speech: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    body = stream
+    if cache is not None:
+        # Stored while it streams, published once the whole synthesis has arrived
+        body = cache_while_streaming(stream, cache.writer(key, response_format))
+    return StreamingResponse(
+        body,
+        media_type=stream.media_type,
+        headers={
+            "X-TTFB-ms": f"{stream.first_byte_seconds * 1000:.1f}",
+            "X-Cache": "MISS" if cache is not None else "BYPASS",
+            "Cache-Control": "no-store",
+        },
+    )
+
+@app.post("/api/tts")
+async def text_to_speech_endpoint(request: TTSRequest, http_request: Request):
+    if not request.text.strip() or len(request.text) > TTS_MAX_CHARS:
+        raise HTTPException(status_code=400, detail=f"text must be 1-{TTS_MAX_CHARS} characters")
+    if request.response_format not in tts_and_stt.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported response_format: {request.response_format}")
+    return await _speech_response(request.text, request.voice, request.response_format, http_request)
+
+@app.get("/api/interview-audio/{session_id}/{question_id}")
+async def interview_audio(session_id: str, question_id: int, http_request: Request, part: str = Query(default="question")):
+    session = await get_presynthesizer().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Audio session not found or expired")
+    item = session.items.get((question_id, part))
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"No {part} audio for question {question_id}")
+    text, _ = item
+    return await _speech_response(text, session.voice, session.response_format, http_request)
+
+TRANSCRIBE_FORMATS = {"json", "verbose_json", "text", "srt", "vtt"}
+
+@app.post("/api/transcribe")
+async def transcribe_endpoint(
+    http_request: Request, language: str = "english", response_format: str = "json", mode: str = "single"
+):
+    """
+    Transcribes a raw audio request body (Content-Type: audio/..., fixed length or chunked).
+    mode=long splits a WAV recording at pauses and transcribes the pieces in parallel (JSON only).
+    """
+    if response_format not in TRANSCRIBE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported response_format: {response_format}")
+    content_type = http_request.headers.get("content-type", "application/octet-stream")
+    if mode not in ("single", "long"):
+        raise HTTPException(status_code=400, detail=f"Unknown mode: {mode}")
+    if mode == "long" and tts_and_stt.AUDIO_EXTENSIONS.get(content_type.split(";")[0].strip().lower()) != "wav":
+        raise HTTPException(status_code=400, detail="mode=long needs a 16-bit PCM WAV upload (Content-Type: audio/wav)")
+    content_length = http_request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > tts_and_stt.TRANSCRIBE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Audio upload too large")
+    await admit_user(http_request)
+    # The upload is spooled before taking a Lemonfox slot, so slow clients don't hold one
+    try:
+        audio = await tts_and_stt.spool_upload(http_request.stream())
+    except tts_and_stt.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        if mode == "long":
+            from audio_segmenter import transcribe_long
+            return await transcribe_long(audio, language)
+        return await tts_and_stt.transcribe_file(audio, content_type, language, response_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
+    except UpstreamStatusError as e:
+        print(f"Error transcribing audio: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        print(f"Error transcribing audio: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        audio.close()
+
 @app.get("/")
 def read_root():
     return {"message": "AI Interview Simulator Backend is running"}
 
-from firebase_utils import initialize_firebase, save_test_result, save_interview_result
+@app.get("/api/cache/stats")
+def cache_stats():
+    audio_cache = get_audio_cache()
+    return {
+        **get_generation_cache().snapshot(),
+        "single_flight": get_single_flight().snapshot(),
+        "audio": audio_cache.snapshot() if audio_cache is not None else None,
+        "audio_presynth": get_presynthesizer().snapshot(),
+        # In-process counters: with several workers this is the worker that answered
+        # (/metrics aggregates all of them)
+        "worker": {"pid": os.getpid(), "count": worker_count()},
+    }
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    # Admin endpoints don't exist unless ADMIN_TOKEN is configured
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+class PoolConfig(BaseModel):
+    kind: str  # "mock_test" or "interview"
+    topic: str
+    difficulty: str = "Medium"
+    target_size: Optional[int] = None
+    low_water: Optional[int] = None
+
+@app.get("/api/admin/pools", dependencies=[Depends(require_admin)])
+def list_pools():
+    return get_question_pools().snapshot()
+
+@app.put("/api/admin/pools", dependencies=[Depends(require_admin)])
+def configure_pool(config: PoolConfig):
+    try:
+        pool = get_question_pools().configure(
+            config.kind, config.topic, config.difficulty, config.target_size, config.low_water
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return pool.snapshot()
+
+@app.delete("/api/admin/pools", dependencies=[Depends(require_admin)])
+def remove_pool(config: PoolConfig):
+    if not get_question_pools().remove(config.kind, config.topic, config.difficulty):
+        raise HTTPException(status_code=404, detail="Pool not found")
+    return {"message": "Pool removed"}
+
+@app.get("/api/admin/write-behind", dependencies=[Depends(require_admin)])
+def write_behind_stats():
+    return get_write_queue().snapshot()
+
+@app.get("/api/admin/model-routes", dependencies=[Depends(require_admin)])
+def model_routes():
+    return get_model_router().snapshot()
+
+@app.get("/api/admin/breakers", dependencies=[Depends(require_admin)])
+def breakers():
+    return {name: policy.snapshot() for name, policy in get_policies().items()}
+
+@app.get("/api/admin/admission", dependencies=[Depends(require_admin)])
+def admission_stats():
+    return admission.snapshot()
 
-# Initialize Firebase
-initialize_firebase()
+@app.get("/ready")
+def ready():
+    status = app_lifecycle.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+from write_behind import get_write_queue
+from storage import get_result_store
+import firebase_utils
+from shared_state import get_shared_state, worker_count
+
+# Existing stats snapshots, read as gauges at scrape time
+metrics.snapshots.add("generation_cache", lambda: get_generation_cache().snapshot())
+metrics.snapshots.add("single_flight", lambda: get_single_flight().snapshot())
+metrics.snapshots.add("write_behind", lambda: get_write_queue().snapshot())
+metrics.snapshots.add("audio_cache", lambda: get_audio_cache().snapshot() if get_audio_cache() is not None else {})
+metrics.snapshots.add("audio_presynth", lambda: get_presynthesizer().snapshot())
+metrics.snapshots.add("interview_sessions", lambda: get_session_store().snapshot())
+for _name, _policy in get_policies().items():
+    metrics.snapshots.add(f"upstream_{_name}", _policy.snapshot)
+    metrics.snapshots.add(f"breaker_{_name}", _policy.breaker.snapshot)
+metrics.snapshots.add("admission_openai", lambda: admission.get_limiter("openai").snapshot())
+metrics.snapshots.add("admission_lemonfox", lambda: admission.get_limiter("lemonfox").snapshot())
+metrics.snapshots.add("user_rate_limit", lambda: admission.get_user_limiter().snapshot())
+metrics.snapshots.add("ip_rate_limit", lambda: admission.get_ip_limiter().snapshot())
+metrics.snapshots.add("shared_state", lambda: get_shared_state().snapshot() if get_shared_state() is not None else {})
+for _route in get_model_router().routes.values():
+    metrics.snapshots.add(f"model_route_{_route.name}", _route.snapshot)
 
 class TestSubmission(BaseModel):
     user_id: str
@@ -100,19 +448,71 @@ class TestSubmission(BaseModel):
 async def submit_test(submission: TestSubmission):
     try:
         print(f"Saving test result for user: {submission.user_id}")
-        save_test_result(
-            submission.user_id, 
-            submission.topic, 
-            submission.difficulty, 
-            submission.score, 
-            submission.total_questions
-        )
-        return {"message": "Test result saved successfully"}
+        # Persisted by the write-behind worker; the response doesn't wait on the database
+        queued = await get_write_queue().submit("mock_test", {
+            "activity_id": uuid.uuid4().hex, # idempotency key for retries
+            "user_id": submission.user_id,
+            "topic": submission.topic,
+            "difficulty": submission.difficulty,
+            "score": submission.score,
+            "total_questions": submission.total_questions,
+        })
+        return {"message": "Test result saved successfully", "queued": queued}
     except Exception as e:
         print(f"Error saving test result: {e}")
         # Don't fail the request if saving fails (graceful degradation)
         return {"message": "Failed to save result", "error": str(e)}
 
+async def require_user(user_id: str, authorization: Optional[str] = Header(default=None)):
+    # A user's dashboard data is only served to that user: the caller sends a
+    # Firebase ID token (Authorization: Bearer <token>) whose uid must match
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing ID token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        uid = await asyncio.to_thread(firebase_utils.verify_id_token, token)
+    except Exception as e:
+        print(f"Error verifying ID token: {e}")
+        raise HTTPException(status_code=503, detail="Could not verify ID token")
+    if uid is None:
+        raise HTTPException(status_code=401, detail="Invalid ID token", headers={"WWW-Authenticate": "Bearer"})
+    if uid != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/api/users/{user_id}/profile", dependencies=[Depends(require_user)])
+async def user_profile(user_id: str):
+    try:
+        profile = await asyncio.to_thread(get_result_store().get_profile, user_id)
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
+    except Exception as e:
+        print(f"Error loading profile: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User profile not found")
+    return profile
+
+@app.get("/api/users/{user_id}/activities", dependencies=[Depends(require_user)])
+async def user_activities(user_id: str, limit: int = Query(default=20, ge=1, le=100), cursor: Optional[str] = None):
+    try:
+        return await asyncio.to_thread(get_result_store().list_activities, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (CircuitOpenError, AdmissionError) as e:
+        raise _rejected(e)
+    except Exception as e:
+        print(f"Error loading activities: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    workers = worker_count()
+    if workers > 1:
+        # Pre-fork workers each import main:app; caches, coalescing and rate limits
+        # are shared through the SQLite file in shared_state.py, metrics through
+        # prometheus_client's multiprocess files
+        metrics.reset_multiprocess_dir()
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
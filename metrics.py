@@ -0,0 +1,216 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, REGISTRY
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Prometheus instrumentation shared by the API and the upstream clients.
+# Label values are bucketed (route templates, topic buckets, difficulty) so
+# cardinality stays bounded; recording a sample is a couple of dict lookups.
+# With several workers, PROMETHEUS_MULTIPROC_DIR switches prometheus_client to
+# multiprocess mode: every worker writes its samples to files in that directory
+# and a scrape served by any worker aggregates all of them.
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency",
+    ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_ERRORS = Counter(
+    "http_request_errors_total", "API requests that ended in a 5xx or an unhandled error",
+    ["endpoint", "method", "status"],
+)
+UPSTREAM_CALL_SECONDS = Histogram(
+    "upstream_call_duration_seconds", "Latency of calls to OpenAI, Lemonfox and Firestore",
+    ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_call_errors_total", "Failed upstream calls by error type",
+    ["upstream", "operation", "error"],
+)
+TTS_FIRST_BYTE_SECONDS = Histogram(
+    "tts_time_to_first_byte_seconds", "Time from a /api/tts request to the first audio byte from Lemonfox",
+    ["response_format"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Prompt/completion tokens reported by the model",
+    ["model", "kind", "operation", "topic_bucket", "difficulty"],
+)
+
+TOPIC_BUCKETS = [
+    b.strip().lower()
+    for b in os.getenv(
+        "METRICS_TOPIC_BUCKETS",
+        "react,angular,vue,javascript,typescript,node,python,django,java,spring,golang,rust,sql,devops,aws,data,machine learning"
+    ).split(",")
+    if b.strip()
+]
+DIFFICULTIES = {"easy", "medium", "hard"}
+
+
+def topic_bucket(topic: Optional[str]) -> str:
+    """
+    Maps a free-text topic onto a fixed set of buckets (first keyword that appears in it).
+    """
+    if not topic:
+        return "none"
+    text = re.sub(r"\s+", " ", topic).strip().lower()
+    for bucket in TOPIC_BUCKETS:
+        if bucket in text:
+            return bucket
+    return "other"
+
+
+def difficulty_label(difficulty: Optional[str]) -> str:
+    value = (difficulty or "").strip().lower()
+    return value if value in DIFFICULTIES else ("none" if not value else "other")
+
+
+class track_upstream:
+    """
+    Context manager timing one upstream call:
+
+        with track_upstream("firestore", "commit"):
+            batch.commit()
+    """
+
+    __slots__ = ("upstream", "operation", "start")
+
+    def __init__(self, upstream: str, operation: str):
+        self.upstream = upstream
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = "ok" if exc_type is None else "error"
+        UPSTREAM_CALL_SECONDS.labels(self.upstream, self.operation, outcome).observe(time.perf_counter() - self.start)
+        if exc_type is not None:
+            UPSTREAM_ERRORS.labels(self.upstream, self.operation, exc_type.__name__).inc()
+        return False
+
+
+def record_llm_usage(model: str, usage: Any, operation: str, topic: Optional[str] = None, difficulty: Optional[str] = None):
+    if usage is None:
+        return
+    bucket = topic_bucket(topic)
+    level = difficulty_label(difficulty)
+    LLM_TOKENS.labels(model, "prompt", operation, bucket, level).inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(model, "completion", operation, bucket, level).inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency/errors per route template.
+    Timing covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            method = scope.get("method", "")
+            code = str(status["code"])
+            HTTP_REQUEST_SECONDS.labels(endpoint, method, code).observe(time.perf_counter() - start)
+            if status["code"] >= 500:
+                HTTP_ERRORS.labels(endpoint, method, code).inc()
+
+
+class SnapshotCollector:
+    """
+    Exposes the numeric fields of existing stats snapshots (cache, single-flight,
+    write-behind queue, ...) as gauges, read at scrape time.
+    In multiprocess mode the snapshots live in each worker's memory, so instead
+    every worker publish()es them periodically into gauges labelled with its pid.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._gauges: Dict[str, Gauge] = {}
+
+    def add(self, name: str, snapshot: Callable[[], Dict[str, Any]]):
+        self._sources[name] = snapshot
+
+    def _values(self):
+        for name, snapshot in self._sources.items():
+            try:
+                values = snapshot()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                yield name, key, value
+
+    def collect(self):
+        for name, key, value in self._values():
+            yield GaugeMetricFamily(f"app_{name}_{key}", f"{name} {key}", value=value)
+
+    def publish(self):
+        for name, key, value in self._values():
+            metric = f"app_{name}_{key}"
+            gauge = self._gauges.get(metric)
+            if gauge is None:
+                gauge = self._gauges[metric] = Gauge(metric, f"{name} {key}", multiprocess_mode="all")
+            gauge.set(value)
+
+
+snapshots = SnapshotCollector()
+if not MULTIPROCESS:
+    REGISTRY.register(snapshots)
+
+
+async def publish_snapshots(interval: float):
+    """
+    Multiprocess mode: keeps this worker's snapshot gauges fresh for scrapes served by other workers.
+    """
+    while True:
+        snapshots.publish()
+        await asyncio.sleep(interval)
+
+
+def reset_multiprocess_dir(default: str = "prometheus_multiproc"):
+    """
+    Called by the parent process before it starts the workers: points them at a
+    clean directory for their metric files (files left by a previous run would be counted again).
+    """
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", default)
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+def render_latest():
+    if MULTIPROCESS:
+        snapshots.publish() # the scraped worker's own values are always current
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
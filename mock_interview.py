@@ -1,21 +1,74 @@
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
 from Schema_and_prompts import (
     InterviewSession, 
     Mock_interview_prompt, 
     InterviewEvaluation, 
-    Interview_evaluation_prompt
+    Interview_evaluation_prompt,
+    QuestionFeedback,
+    Question_evaluation_prompt,
+    InterviewSummary,
+    Evaluation_summary_prompt
 )
+from llm_client import stream_content
+from model_router import get_model_router, model_for
+from question_stream import iter_questions
+from transcript_builder import TokenCounter, TranscriptBuilder, compact_text, ANSWER_TOKEN_BUDGET
+import asyncio
 import json
 
 load_dotenv()
 
+# Parallel evaluation: max concurrent per-question calls.
+# Models come from the model routes (the summary uses the cheaper "evaluation_summary" route).
+EVALUATION_CONCURRENCY = int(os.getenv("EVALUATION_CONCURRENCY", "5"))
+
+
+def _interview_messages(topic: str, difficulty: str) -> List[Dict[str, str]]:
+    formatted_prompt = Mock_interview_prompt.format(topic=topic, difficulty=difficulty)
+    return [
+        {"role": "system", "content": formatted_prompt},
+    ]
+
+
+def _to_interview_questions(session: InterviewSession, topic: str, difficulty: str) -> List[dict]:
+    questions_list = [q.model_dump() for q in session.questions]
+    print("\n" + "="*50)
+    print(f"GENERATED INTERVIEW QUESTIONS FOR: {topic} ({difficulty})")
+    print("="*50)
+    print(json.dumps(questions_list, indent=2))
+    print("="*50 + "\n")
+    return questions_list
+
+
+def _evaluation_messages(
+    topic: str,
+    difficulty: str,
+    qa_list: List[Dict[str, Any]],
+    model: str = "gpt-4o"
+) -> List[Dict[str, str]]:
+    # Format transcript for the prompt, compacting answers to the token budget
+    builder = TranscriptBuilder(model=model)
+    for item in qa_list:
+        builder.add(f"Q{item.get('question_id')}: {item.get('question_text')}", item.get('user_answer'))
+    transcript = builder.build()
+    print(f"Evaluation transcript tokens: {builder.stats}")
+
+    formatted_prompt = Interview_evaluation_prompt.format(
+        topic=topic,
+        difficulty=difficulty,
+        qa_transcript=transcript
+    )
+    return [
+        {"role": "system", "content": formatted_prompt},
+    ]
+
+
 def generate_interview_questions(
     topic: str,
     difficulty: str = "Medium",
-    model: str = "gpt-4o"
+    model: Optional[str] = None
 ) -> List[dict]:
     """
     Generates scenario-based and behavioural interview questions.
@@ -24,64 +77,185 @@ def generate_interview_questions(
     if not api_key:
         raise ValueError("OPENAI_API_KEY not found")
 
-    client = OpenAI(api_key=api_key)
+    from openai import OpenAI
 
-    formatted_prompt = Mock_interview_prompt.format(topic=topic, difficulty=difficulty)
+    client = OpenAI(api_key=api_key)
 
     completion = client.chat.completions.parse(
-        model=model,
-        messages=[
-            {"role": "system", "content": formatted_prompt},
-        ],
+        model=model or model_for("interview"),
+        messages=_interview_messages(topic, difficulty),
         response_format=InterviewSession,
     )
 
     session: InterviewSession = completion.choices[0].message.parsed
-    questions_list = [q.model_dump() for q in session.questions]
-    print("\n" + "="*50)
-    print(f"GENERATED INTERVIEW QUESTIONS FOR: {topic} ({difficulty})")
-    print("="*50)
-    print(json.dumps(questions_list, indent=2))
-    print("="*50 + "\n")
-    return questions_list
+    return _to_interview_questions(session, topic, difficulty)
+
+
+async def agenerate_interview_questions(
+    topic: str,
+    difficulty: str = "Medium",
+    model: Optional[str] = None
+) -> List[dict]:
+    """
+    Async variant of generate_interview_questions (shared pooled client, non-blocking).
+    Routed through the "interview" model route; `model` overrides its primary.
+    """
+    session = await get_model_router().parse(
+        "interview", _interview_messages(topic, difficulty), InterviewSession, model,
+        topic=topic, difficulty=difficulty
+    )
+    return _to_interview_questions(session, topic, difficulty)
+
+
+async def astream_interview_questions(
+    topic: str,
+    difficulty: str = "Medium",
+    model: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant: yields each InterviewQuestion dict as soon as it is complete and validated.
+    Streams use the route's primary model without hedging.
+    """
+    deltas = stream_content(
+        _interview_messages(topic, difficulty), InterviewSession, model or model_for("interview"),
+        operation="interview_stream", topic=topic, difficulty=difficulty
+    )
+    async for question in iter_questions("interview", deltas):
+        yield question
 
 
 def evaluate_interview(
     topic: str,
     difficulty: str,
     qa_list: List[Dict[str, Any]], # List of {question_id, question_text, user_answer}
-    model: str = "gpt-4o"
+    model: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Evaluates the entire interview session.
     """
+    model = model or model_for("evaluation")
     api_key = os.getenv("OPENAI_API_KEY")
+    from openai import OpenAI
+
     client = OpenAI(api_key=api_key)
 
-    # Format transcript for the prompt
-    transcript = ""
-    for item in qa_list:
-        transcript += f"\nQ{item.get('question_id')}: {item.get('question_text')}\n"
-        transcript += f"Candidate Answer: {item.get('user_answer')}\n"
-        transcript += "-" * 20
+    completion = client.chat.completions.parse(
+        model=model,
+        messages=_evaluation_messages(topic, difficulty, qa_list, model),
+        response_format=InterviewEvaluation,
+    )
 
-    formatted_prompt = Interview_evaluation_prompt.format(
+    evaluation: InterviewEvaluation = completion.choices[0].message.parsed
+    return evaluation.model_dump()
+
+
+async def aevaluate_interview(
+    topic: str,
+    difficulty: str,
+    qa_list: List[Dict[str, Any]],
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Async variant of evaluate_interview (shared pooled client, non-blocking).
+    """
+    model = model or model_for("evaluation")
+    evaluation = await get_model_router().parse(
+        "evaluation", _evaluation_messages(topic, difficulty, qa_list, model), InterviewEvaluation, model,
+        topic=topic, difficulty=difficulty
+    )
+    return evaluation.model_dump()
+
+async def aevaluate_answer(
+    topic: str,
+    difficulty: str,
+    item: Dict[str, Any], # {question_id, question_text, user_answer}
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Scores a single answer as its own QuestionFeedback call.
+    """
+    model = model or model_for("evaluation")
+    answer = compact_text(item.get("user_answer") or "", ANSWER_TOKEN_BUDGET, TokenCounter(model))
+    formatted_prompt = Question_evaluation_prompt.format(
         topic=topic,
         difficulty=difficulty,
-        qa_transcript=transcript
+        question_id=item.get("question_id"),
+        question_text=item.get("question_text"),
+        user_answer=answer["text"],
+    )
+    feedback = await get_model_router().parse(
+        "evaluation", [{"role": "system", "content": formatted_prompt}], QuestionFeedback, model,
+        operation="evaluate_answer", topic=topic, difficulty=difficulty
     )
+    # Trust our own id over whatever the model echoed back
+    feedback.question_id = item.get("question_id")
+    return feedback.model_dump()
 
-    completion = client.chat.completions.parse(
-        model=model,
-        messages=[
-            {"role": "system", "content": formatted_prompt},
-        ],
-        response_format=InterviewEvaluation,
+
+def _fallback_summary(feedbacks: List[Dict[str, Any]], average: float) -> Dict[str, Any]:
+    # Deterministic summary used when the summary call fails
+    ranked = sorted(feedbacks, key=lambda f: f["score"], reverse=True)
+    return {
+        "overall_feedback": f"Average score {average:.1f}/10 across {len(feedbacks)} questions.",
+        "strengths": [f"Q{f['question_id']}: {f['feedback']}" for f in ranked[:3] if f["score"] >= 7],
+        "areas_for_improvement": [f"Q{f['question_id']}: {f['feedback']}" for f in ranked[::-1][:3] if f["score"] <= 5],
+    }
+
+
+async def aggregate_feedbacks(
+    topic: str,
+    difficulty: str,
+    feedbacks: List[Dict[str, Any]],
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Builds an InterviewEvaluation dict from per-question feedback.
+    overall_score is computed in code; the text summary comes from one small model call.
+    """
+    average = sum(f["score"] for f in feedbacks) / len(feedbacks) if feedbacks else 0.0
+    overall_score = max(0, min(100, round(average * 10)))
+
+    digest = "\n".join(f"Q{f['question_id']} ({f['score']}/10): {f['feedback']}" for f in feedbacks)
+    formatted_prompt = Evaluation_summary_prompt.format(
+        topic=topic, difficulty=difficulty, feedback_digest=digest
     )
+    try:
+        summary = (await get_model_router().parse(
+            "evaluation_summary", [{"role": "system", "content": formatted_prompt}], InterviewSummary, model,
+            topic=topic, difficulty=difficulty
+        )).model_dump()
+    except Exception as e:
+        print(f"Evaluation summary call failed, using deterministic summary: {e}")
+        summary = _fallback_summary(feedbacks, average)
 
-    evaluation: InterviewEvaluation = completion.choices[0].message.parsed
+    evaluation = InterviewEvaluation(
+        overall_score=overall_score,
+        question_feedbacks=feedbacks,
+        **summary,
+    )
     return evaluation.model_dump()
 
+
+async def aevaluate_interview_parallel(
+    topic: str,
+    difficulty: str,
+    qa_list: List[Dict[str, Any]],
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Evaluates every answer concurrently (bounded by EVALUATION_CONCURRENCY), then aggregates.
+    Returns the same shape as evaluate_interview.
+    """
+    semaphore = asyncio.Semaphore(EVALUATION_CONCURRENCY)
+
+    async def evaluate(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await aevaluate_answer(topic, difficulty, item, model)
+
+    feedbacks = await asyncio.gather(*(evaluate(item) for item in qa_list))
+    return await aggregate_feedbacks(topic, difficulty, list(feedbacks))
+
+
 if __name__ == "__main__":
     # Test generation
     print("Generating Interview Questions...")
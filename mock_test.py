@@ -1,17 +1,40 @@
 # pip install --upgrade openai
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
-from typing import List
+from typing import AsyncIterator, List, Optional
 from Schema_and_prompts import MockTest, Mock_test_prompt
+from llm_client import stream_content
+from model_router import get_model_router, model_for
+from question_stream import iter_questions
 
 load_dotenv()
 
 
+def _build_messages(topic: str, difficulty: str) -> List[dict]:
+    # dynamically insert difficulty into prompt
+    formatted_prompt = Mock_test_prompt.format(difficulty=difficulty)
+    return [
+        {"role": "system", "content": formatted_prompt},
+        {"role": "user", "content": topic},
+    ]
+
+
+def _to_questions(mock_test: MockTest) -> List[dict]:
+    # Convert Pydantic models → plain dicts for frontend
+    questions = [q.model_dump() for q in mock_test.questions]
+
+    print("*"*50)
+    for q in questions:
+        print(q)
+    print("*"*50)
+
+    return questions
+
+
 def generate_mock_test_questions(
     topic: str,
     difficulty: str = "Medium",
-    model: str = "gpt-4o"
+    model: Optional[str] = None
 ) -> List[dict]:
     """
     Generates interview-level mock test questions for a given topic and difficulty.
@@ -24,33 +47,54 @@ def generate_mock_test_questions(
     if not api_key:
         raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-    client = OpenAI(api_key=api_key)
+    # Deferred so importing this module (e.g. at app boot) doesn't pay for the SDK
+    from openai import OpenAI
 
-    # dynamically insert difficulty into prompt
-    formatted_prompt = Mock_test_prompt.format(difficulty=difficulty)
+    client = OpenAI(api_key=api_key)
 
     completion = client.chat.completions.parse(
-        model=model,
-        messages=[
-            {"role": "system", "content": formatted_prompt},
-            {"role": "user", "content": topic},
-        ],
+        model=model or model_for("mock_test"),
+        messages=_build_messages(topic, difficulty),
         response_format=MockTest,
     )
 
     mock_test: MockTest = completion.choices[0].message.parsed
-
-    # Convert Pydantic models → plain dicts for frontend
-    questions = [q.model_dump() for q in mock_test.questions]
+    return _to_questions(mock_test)
 
 
-    print("*"*50)
-    for q in questions:
-        print(q)
-    print("*"*50)
+async def agenerate_mock_test_questions(
+    topic: str,
+    difficulty: str = "Medium",
+    model: Optional[str] = None
+) -> List[dict]:
+    """
+    Async variant of generate_mock_test_questions.
+    Uses the shared pooled AsyncOpenAI client so it never blocks the event loop.
+    Routed through the "mock_test" model route (hedging + fallback); `model` overrides its primary.
+    """
+    mock_test = await get_model_router().parse(
+        "mock_test", _build_messages(topic, difficulty), MockTest, model,
+        topic=topic, difficulty=difficulty
+    )
+    return _to_questions(mock_test)
 
-    return questions
 
+async def astream_mock_test_questions(
+    topic: str,
+    difficulty: str = "Medium",
+    model: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant: yields each question dict as soon as it is complete and validated.
+    Streams use the route's primary model without hedging.
+    """
+    deltas = stream_content(
+        _build_messages(topic, difficulty), MockTest, model or model_for("mock_test"),
+        operation="mock_test_stream", topic=topic, difficulty=difficulty
+    )
+    async for question in iter_questions("mock_test", deltas):
+        yield question
 
 
-generate_mock_test_questions("React Js Developer")
+if __name__ == "__main__":
+    generate_mock_test_questions("React Js Developer")
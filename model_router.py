@@ -0,0 +1,234 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from llm_client import DEFAULT_MODEL, parse_completion
+
+load_dotenv()
+
+T = TypeVar("T", bound=BaseModel)
+
+# Per-endpoint model routing with hedged requests and a fallback model.
+#   - Each route (mock_test, interview, evaluation, evaluation_summary) has its own
+#     model, fallback model and deadline: MODEL_<ROUTE>, MODEL_<ROUTE>_FALLBACK,
+#     MODEL_<ROUTE>_TIMEOUT_SECONDS.
+#   - Hedging: if the first call hasn't returned by the route's rolling latency
+#     percentile (HEDGE_PERCENTILE), a second identical call is fired and the first
+#     valid parsed result wins; the loser is cancelled. Hedges are capped at
+#     HEDGE_MAX_RATIO of requests so a slow upstream isn't hit with double load.
+#   - Fallback: if the primary times out or returns an unparseable response, the
+#     request is retried once on the fallback model.
+
+ROUTES = ["mock_test", "interview", "evaluation", "evaluation_summary"]
+ROUTE_DEFAULT_MODELS = {
+    "evaluation_summary": os.getenv("EVALUATION_SUMMARY_MODEL", "gpt-4o-mini"),
+}
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv("HEDGE_INITIAL_DELAY_SECONDS", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "1"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+LATENCY_WINDOW = int(os.getenv("HEDGE_LATENCY_WINDOW", "200"))
+
+
+def _is_fallback_error(error: BaseException) -> bool:
+    """
+    Timeouts and unparseable output are worth retrying on another model;
+    auth/quota/bad-request errors are not.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ValueError)):
+        return True
+    from openai import ContentFilterFinishReasonError, LengthFinishReasonError
+    return isinstance(error, (LengthFinishReasonError, ContentFilterFinishReasonError))
+
+
+class LatencyWindow:
+    """
+    Rolling window of recent call latencies (seconds).
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class ModelRoute:
+    def __init__(self, name: str, model: str, fallback_model: Optional[str], timeout: float):
+        self.name = name
+        self.model = model
+        self.fallback_model = fallback_model or None
+        self.timeout = timeout
+        self.latency = LatencyWindow()
+        self.stats = {
+            "requests": 0, "hedges": 0, "hedge_wins": 0,
+            "fallbacks": 0, "fallback_failures": 0, "timeouts": 0,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before hedging, or None if this request may not hedge.
+        """
+        if not HEDGE_ENABLED or self.stats["hedges"] + 1 > HEDGE_MAX_RATIO * self.stats["requests"]:
+            return None
+        if len(self.latency) < HEDGE_MIN_SAMPLES:
+            delay = HEDGE_INITIAL_DELAY_SECONDS
+        else:
+            delay = self.latency.percentile(HEDGE_PERCENTILE)
+        delay = max(HEDGE_MIN_DELAY_SECONDS, delay)
+        return delay if delay < self.timeout else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "timeout_seconds": self.timeout,
+            "samples": len(self.latency),
+            "p50_seconds": self.latency.percentile(50),
+            "p95_seconds": self.latency.percentile(95),
+            "hedge_delay_seconds": self.hedge_delay(),
+            **self.stats,
+        }
+
+
+class ModelRouter:
+    def __init__(self, routes: Dict[str, ModelRoute]):
+        self.routes = routes
+
+    def route(self, name: str) -> ModelRoute:
+        if name not in self.routes:
+            raise ValueError(f"Unknown model route: {name}")
+        return self.routes[name]
+
+    async def _hedged(
+        self,
+        route: ModelRoute,
+        model: str,
+        messages: List[Dict[str, str]],
+        response_format: Type[T],
+        labels: Dict[str, Any]
+    ) -> T:
+        delay = route.hedge_delay()
+        started = {}
+
+        def launch() -> asyncio.Task:
+            task = asyncio.ensure_future(parse_completion(messages, response_format, model, **labels))
+            started[task] = time.monotonic()
+            return task
+
+        first = launch()
+        pending = {first}
+        hedge = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    route.stats["hedges"] += 1
+                    hedge = launch()
+                    pending.add(hedge)
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        route.latency.record(time.monotonic() - started[task])
+                        if task is hedge:
+                            route.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def parse(
+        self,
+        route_name: str,
+        messages: List[Dict[str, str]],
+        response_format: Type[T],
+        model: Optional[str] = None,
+        operation: Optional[str] = None,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None
+    ) -> T:
+        """
+        Structured completion for one route: hedged call on the primary model
+        (or `model` if given), then one attempt on the fallback model.
+        """
+        route = self.route(route_name)
+        primary = model or route.model
+        labels = {"operation": operation or route_name, "topic": topic, "difficulty": difficulty}
+        route.stats["requests"] += 1
+        try:
+            return await asyncio.wait_for(
+                self._hedged(route, primary, messages, response_format, labels), timeout=route.timeout
+            )
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                route.stats["timeouts"] += 1
+            if not route.fallback_model or route.fallback_model == primary or not _is_fallback_error(e):
+                raise
+            print(f"Warning: {route_name} on {primary} failed ({type(e).__name__}), falling back to {route.fallback_model}")
+            route.stats["fallbacks"] += 1
+            try:
+                return await asyncio.wait_for(
+                    parse_completion(messages, response_format, route.fallback_model, **labels),
+                    timeout=route.timeout,
+                )
+            except Exception:
+                route.stats["fallback_failures"] += 1
+                raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: route.snapshot() for name, route in self.routes.items()}
+
+
+def create_model_router() -> ModelRouter:
+    default_fallback = os.getenv("MODEL_FALLBACK", "gpt-4o-mini")
+    default_timeout = float(os.getenv("MODEL_TIMEOUT_SECONDS", "90"))
+    routes = {}
+    for name in ROUTES:
+        prefix = f"MODEL_{name.upper()}"
+        routes[name] = ModelRoute(
+            name=name,
+            model=os.getenv(prefix, ROUTE_DEFAULT_MODELS.get(name, DEFAULT_MODEL)),
+            fallback_model=os.getenv(f"{prefix}_FALLBACK", default_fallback),
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", default_timeout)),
+        )
+    return ModelRouter(routes)
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = create_model_router()
+    return _router
+
+
+def model_for(route_name: str) -> str:
+    """
+    The configured primary model for a route (used for cache keys and streaming).
+    """
+    return get_model_router().route(route_name).model
@@ -0,0 +1,289 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from generation_cache import normalize
+from shared_state import worker_count
+
+load_dotenv()
+
+# Per-(kind, topic, difficulty) pools of pre-generated question sets.
+# Hot pairs are served instantly from the pool so users on the same topic get
+# different sets; a background worker tops pools back up when they drop below
+# their low-water mark. If a pool is empty and the upstream is slow or failing,
+# the last served set is returned (stale-while-revalidate) and the refresh
+# continues in the background.
+# Sizes are host-wide: with several workers each one keeps its share
+# (ceil(size / workers)), so adding workers doesn't multiply upstream spend.
+
+Generator = Callable[[str, str], Awaitable[List[dict]]]
+PoolKey = Tuple[str, str, str]
+
+
+class QuestionPool:
+    def __init__(self, kind: str, topic: str, difficulty: str, target_size: int, low_water: int, workers: int = 1):
+        self.kind = kind
+        self.topic = topic
+        self.difficulty = difficulty
+        self.target_size = target_size
+        self.low_water = low_water
+        self.workers = workers
+        self.sets: Deque[Tuple[float, List[dict]]] = deque()
+        self.stale: Optional[List[dict]] = None
+        self.pending = 0
+        self.stats = {"served": 0, "served_stale": 0, "empty": 0, "refilled": 0, "refill_errors": 0}
+
+    def worker_target(self) -> int:
+        return math.ceil(self.target_size / self.workers)
+
+    def worker_low_water(self) -> int:
+        return math.ceil(self.low_water / self.workers)
+
+    def needs_refill(self) -> bool:
+        return len(self.sets) + self.pending < self.worker_low_water() or (
+            not self.sets and self.pending == 0
+        )
+
+    def missing(self) -> int:
+        return max(0, self.worker_target() - len(self.sets) - self.pending)
+
+    def snapshot(self) -> Dict[str, Any]:
+        oldest = min((ts for ts, _ in self.sets), default=None)
+        return {
+            "kind": self.kind,
+            "topic": self.topic,
+            "difficulty": self.difficulty,
+            "target_size": self.target_size,
+            "low_water": self.low_water,
+            "worker_target_size": self.worker_target(),
+            "available": len(self.sets),
+            "pending": self.pending,
+            "has_stale": self.stale is not None,
+            "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+            **self.stats,
+        }
+
+
+def parse_hot_topics(spec: str) -> List[Tuple[str, str, str]]:
+    """
+    Parses POOL_HOT_TOPICS, e.g. "mock_test|React Js Developer|Medium;interview|Python Developer|Hard".
+    """
+    entries = []
+    for raw in spec.split(";"):
+        if not raw.strip():
+            continue
+        parts = [p.strip() for p in raw.split("|")]
+        if len(parts) != 3:
+            raise ValueError(f"Invalid POOL_HOT_TOPICS entry: {raw!r} (expected kind|topic|difficulty)")
+        entries.append((parts[0], parts[1], parts[2]))
+    return entries
+
+
+class QuestionPoolManager:
+    def __init__(
+        self,
+        generators: Dict[str, Generator],
+        target_size: int = 5,
+        low_water: int = 2,
+        refill_concurrency: int = 2,
+        refill_interval: float = 30.0,
+        upstream_deadline: float = 20.0,
+        max_size: int = 50,
+        workers: int = 1
+    ):
+        self.generators = generators
+        self.max_size = max_size
+        self.workers = workers
+        self.default_target_size = target_size
+        self.default_low_water = low_water
+        self.refill_interval = refill_interval
+        self.upstream_deadline = upstream_deadline
+        self.pools: Dict[PoolKey, QuestionPool] = {}
+        self._semaphore = asyncio.Semaphore(refill_concurrency)
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(kind: str, topic: str, difficulty: str) -> PoolKey:
+        return (kind, normalize(topic), normalize(difficulty))
+
+    # ---- configuration -------------------------------------------------
+
+    def configure(
+        self,
+        kind: str,
+        topic: str,
+        difficulty: str,
+        target_size: Optional[int] = None,
+        low_water: Optional[int] = None
+    ) -> QuestionPool:
+        if kind not in self.generators:
+            raise ValueError(f"Unknown pool kind: {kind}")
+        key = self.key(kind, topic, difficulty)
+        pool = self.pools.get(key)
+        # Every pooled set is an upstream generation, so sizes are bounded
+        size = target_size if target_size is not None else (pool.target_size if pool else self.default_target_size)
+        if not 1 <= size <= self.max_size:
+            raise ValueError(f"target_size must be between 1 and {self.max_size}")
+        water = low_water if low_water is not None else (pool.low_water if pool else min(self.default_low_water, size))
+        if not 0 <= water <= size:
+            raise ValueError(f"low_water must be between 0 and target_size ({size})")
+        if pool is None:
+            pool = QuestionPool(kind, topic, difficulty, size, water, self.workers)
+            self.pools[key] = pool
+        else:
+            pool.target_size = size
+            pool.low_water = water
+        self._wakeup.set()
+        return pool
+
+    def remove(self, kind: str, topic: str, difficulty: str) -> bool:
+        return self.pools.pop(self.key(kind, topic, difficulty), None) is not None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "defaults": {
+                "target_size": self.default_target_size,
+                "low_water": self.default_low_water,
+                "max_size": self.max_size,
+                "workers": self.workers,
+                "refill_interval_seconds": self.refill_interval,
+                "upstream_deadline_seconds": self.upstream_deadline,
+            },
+            "worker_running": self._worker is not None and not self._worker.done(),
+            "pools": [pool.snapshot() for pool in self.pools.values()],
+        }
+
+    # ---- serving ---------------------------------------------------------
+
+    def take(self, kind: str, topic: str, difficulty: str) -> Optional[List[dict]]:
+        """
+        Pops a ready set without waiting on the upstream; None if nothing is pooled right now.
+        """
+        pool = self.pools.get(self.key(kind, topic, difficulty))
+        if pool is None or not pool.sets:
+            return None
+        _, questions = pool.sets.popleft()
+        pool.stats["served"] += 1
+        pool.stale = questions
+        if pool.needs_refill():
+            self._wakeup.set()
+        return questions
+
+    async def acquire(self, kind: str, topic: str, difficulty: str) -> Optional[List[dict]]:
+        """
+        Returns a question set for a pooled (hot) pair, or None if the pair isn't pooled.
+        """
+        pool = self.pools.get(self.key(kind, topic, difficulty))
+        if pool is None:
+            return None
+
+        questions = self.take(kind, topic, difficulty)
+        if questions is not None:
+            return questions
+
+        pool.stats["empty"] += 1
+        pool.pending += 1
+        state = {"abandoned": False}
+        task = asyncio.create_task(self._generate_fresh(pool, state))
+        # Retrieve the exception of an abandoned task so it isn't logged as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            if pool.stale is None:
+                questions = await asyncio.shield(task)
+            else:
+                questions = await asyncio.wait_for(asyncio.shield(task), timeout=self.upstream_deadline)
+        except Exception as e:
+            if pool.stale is None:
+                raise
+            # Upstream slow or down: serve the last set, the task keeps running
+            state["abandoned"] = True
+            print(f"Pool {kind}/{pool.topic}/{pool.difficulty}: serving stale set ({type(e).__name__})")
+            pool.stats["served_stale"] += 1
+            self._wakeup.set()
+            return pool.stale
+        pool.stats["served"] += 1
+        pool.stale = questions
+        self._wakeup.set()
+        return questions
+
+    async def _generate_fresh(self, pool: QuestionPool, state: Dict[str, bool]) -> List[dict]:
+        try:
+            questions = await self.generators[pool.kind](pool.topic, pool.difficulty)
+        except Exception:
+            pool.stats["refill_errors"] += 1
+            raise
+        finally:
+            pool.pending -= 1
+        # A late result the caller stopped waiting for goes back into the pool
+        if state["abandoned"]:
+            pool.sets.append((time.time(), questions))
+            pool.stats["refilled"] += 1
+        return questions
+
+    # ---- background refill -------------------------------------------------
+
+    async def _refill_one(self, pool: QuestionPool):
+        async with self._semaphore:
+            try:
+                questions = await self.generators[pool.kind](pool.topic, pool.difficulty)
+                pool.sets.append((time.time(), questions))
+                pool.stats["refilled"] += 1
+            except Exception as e:
+                pool.stats["refill_errors"] += 1
+                print(f"Pool refill failed for {pool.kind}/{pool.topic}/{pool.difficulty}: {e}")
+            finally:
+                pool.pending -= 1
+
+    async def refill_once(self):
+        jobs = []
+        for pool in list(self.pools.values()):
+            if pool.needs_refill():
+                for _ in range(pool.missing()):
+                    pool.pending += 1
+                    jobs.append(self._refill_one(pool))
+        if jobs:
+            await asyncio.gather(*jobs)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            await self.refill_once()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+def create_pool_manager(generators: Dict[str, Generator]) -> QuestionPoolManager:
+    manager = QuestionPoolManager(
+        generators,
+        target_size=int(os.getenv("POOL_TARGET_SIZE", "5")),
+        low_water=int(os.getenv("POOL_LOW_WATER", "2")),
+        refill_concurrency=int(os.getenv("POOL_REFILL_CONCURRENCY", "2")),
+        refill_interval=float(os.getenv("POOL_REFILL_INTERVAL_SECONDS", "30")),
+        upstream_deadline=float(os.getenv("POOL_UPSTREAM_DEADLINE_SECONDS", "20")),
+        max_size=int(os.getenv("POOL_MAX_SIZE", "50")),
+        workers=worker_count(),
+    )
+    for kind, topic, difficulty in parse_hot_topics(os.getenv("POOL_HOT_TOPICS", "")):
+        manager.configure(kind, topic, difficulty)
+    return manager
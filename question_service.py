@@ -0,0 +1,100 @@
+import os
+from typing import AsyncIterator, Callable, List, Optional
+
+from generation_cache import get_generation_cache
+from mock_test import agenerate_mock_test_questions, astream_mock_test_questions
+from mock_interview import agenerate_interview_questions, astream_interview_questions
+from model_router import model_for
+from question_pool import QuestionPoolManager, create_pool_manager
+from single_flight import get_single_flight
+
+# Entry points used by the API handlers for question generation.
+# Hot (topic, difficulty) pairs are served from pre-generated pools so users get
+# distinct sets; everything else goes through the generation cache, with
+# concurrent identical misses coalesced onto a single upstream call.
+
+# How long one caller waits on a shared in-flight generation (unset = no limit)
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "0")) or None
+
+_pools: Optional[QuestionPoolManager] = None
+
+
+async def _fresh_mock_test(topic: str, difficulty: str) -> List[dict]:
+    return await agenerate_mock_test_questions(topic, difficulty)
+
+
+async def _fresh_interview(topic: str, difficulty: str) -> List[dict]:
+    return await agenerate_interview_questions(topic, difficulty)
+
+
+def get_question_pools() -> QuestionPoolManager:
+    global _pools
+    if _pools is None:
+        _pools = create_pool_manager({
+            "mock_test": _fresh_mock_test,
+            "interview": _fresh_interview,
+        })
+    return _pools
+
+
+async def get_mock_test(topic: str, difficulty: str = "Medium") -> List[dict]:
+    pooled = await get_question_pools().acquire("mock_test", topic, difficulty)
+    if pooled is not None:
+        return pooled
+    model = model_for("mock_test")
+    return await get_generation_cache().get_or_generate(
+        "mock_test", topic, difficulty, model,
+        lambda: agenerate_mock_test_questions(topic, difficulty, model),
+        single_flight=get_single_flight(),
+        wait_timeout=SINGLE_FLIGHT_WAIT_SECONDS,
+    )
+
+
+async def get_interview_questions(topic: str, difficulty: str = "Medium") -> List[dict]:
+    pooled = await get_question_pools().acquire("interview", topic, difficulty)
+    if pooled is not None:
+        return pooled
+    model = model_for("interview")
+    return await get_generation_cache().get_or_generate(
+        "interview", topic, difficulty, model,
+        lambda: agenerate_interview_questions(topic, difficulty, model),
+        single_flight=get_single_flight(),
+        wait_timeout=SINGLE_FLIGHT_WAIT_SECONDS,
+    )
+
+
+async def _stream_questions(
+    kind: str,
+    topic: str,
+    difficulty: str,
+    streamer: Callable[[str, str, str], AsyncIterator[dict]]
+) -> AsyncIterator[dict]:
+    # A ready pooled or cached set is replayed at once; otherwise stream from the model
+    ready = get_question_pools().take(kind, topic, difficulty)
+    cache = get_generation_cache()
+    model = model_for(kind)
+    key = cache.make_key(kind, topic, difficulty, model)
+    if ready is None:
+        ready = await cache.get(key)
+    if ready is not None:
+        for question in ready:
+            yield question
+        return
+
+    collected = []
+    async for question in streamer(topic, difficulty, model):
+        collected.append(question)
+        yield question
+    # A refusal or an empty array ends the stream cleanly with nothing in it:
+    # fail like the non-streaming path instead of caching an empty set
+    if not collected:
+        raise ValueError(f"Model {model} returned no {kind} questions")
+    await cache.set(key, kind, collected)
+
+
+def stream_mock_test(topic: str, difficulty: str = "Medium") -> AsyncIterator[dict]:
+    return _stream_questions("mock_test", topic, difficulty, astream_mock_test_questions)
+
+
+def stream_interview_questions(topic: str, difficulty: str = "Medium") -> AsyncIterator[dict]:
+    return _stream_questions("interview", topic, difficulty, astream_interview_questions)
@@ -0,0 +1,85 @@
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+from Schema_and_prompts import Question, InterviewQuestion
+
+# Incremental parsing of a streamed structured-output response.
+# Both MockTest and InterviewSession are `{"questions": [ {...}, {...} ]}`, so we
+# only need to find each complete object inside the top-level array and
+# validate it on its own as soon as its closing brace arrives.
+
+
+class ArrayItemExtractor:
+    """
+    Feed it JSON text chunk by chunk; it returns the raw text of every object
+    that has been fully closed inside the first array of the root object.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = -1
+
+    def feed(self, chunk: str) -> List[str]:
+        self._text += chunk
+        items = []
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                # depth 1 = root object, 2 = the questions array, 3 = an item
+                if self._depth == 3 and ch == "{":
+                    self._item_start = i
+            elif ch in "}]":
+                if self._depth == 3 and ch == "}" and self._item_start >= 0:
+                    items.append(text[self._item_start:i + 1])
+                    self._item_start = -1
+                self._depth -= 1
+            i += 1
+
+        # Drop text we will never need again to keep memory flat
+        keep_from = self._item_start if self._item_start >= 0 else i
+        self._text = text[keep_from:]
+        self._pos = i - keep_from
+        if self._item_start >= 0:
+            self._item_start = 0
+        return items
+
+
+_question_adapter = TypeAdapter(Question)
+
+VALIDATORS: Dict[str, Callable[[str], Any]] = {
+    "mock_test": lambda raw: _question_adapter.validate_json(raw),
+    "interview": lambda raw: InterviewQuestion.model_validate_json(raw),
+}
+
+
+async def iter_questions(kind: str, deltas: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """
+    Turns a stream of content deltas into validated question dicts, one at a time.
+    """
+    validate = VALIDATORS[kind]
+    extractor = ArrayItemExtractor()
+    async for delta in deltas:
+        for raw in extractor.feed(delta):
+            yield validate(raw).model_dump()
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
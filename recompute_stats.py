@@ -0,0 +1,185 @@
+"""
+Bulk recompute of mock-test aggregates (totalTests, testScoreSum, averageScore)
+for every user. Replaces the old single-user fix_stats.py.
+
+Saves only Increment the profile counters, so this is also the one-off backfill
+for profiles that predate testScoreSum (run it once after deploying), and it
+fills in joinedAt for profiles created by a save, from their oldest activity.
+
+- Walks `users` in document-id order with paginated cursors.
+- Uses Firestore aggregation queries (count + sum over activities where
+  type == "mock_test"), so no activity documents are downloaded.
+- Processes each page with bounded parallelism and checkpoints after every
+  page, so an interrupted run resumes where it stopped.
+- --dry-run prints the per-user diff without writing.
+
+Usage:
+    python recompute_stats.py --dry-run
+    python recompute_stats.py --concurrency 16 --page-size 500
+    python recompute_stats.py --user B5L6LZOSlbhAKkpV3BQc5fMiFqD3
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from firebase_utils import get_db
+
+AGGREGATE_FIELDS = ["totalTests", "testScoreSum", "averageScore"]
+PROFILE_FIELDS = AGGREGATE_FIELDS + ["joinedAt"]
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"last_user_id": None, "processed": 0, "changed": 0}
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def aggregate_mock_tests(user_ref, transaction=None) -> Dict[str, float]:
+    """
+    count/sum of mock test scores for one user, computed server-side.
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = user_ref.collection("activities").where(filter=FieldFilter("type", "==", "mock_test"))
+    aggregation = query.count(alias="count").sum("score", alias="sum")
+    results = aggregation.get(transaction=transaction)
+    values = {result.alias: result.value for result in results[0]}
+    return {"count": int(values.get("count") or 0), "sum": float(values.get("sum") or 0)}
+
+
+def first_activity_at(user_ref, transaction=None):
+    """
+    Timestamp of the user's oldest activity, or None.
+    """
+    query = user_ref.collection("activities").order_by("timestamp").select(["timestamp"]).limit(1)
+    for doc in query.get(transaction=transaction):
+        return doc.to_dict().get("timestamp")
+    return None
+
+
+def compute_changes(user_ref, current: Dict[str, Any], transaction=None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    compute_diff plus the joinedAt backfill for profiles that lack it.
+    """
+    expected, diff = compute_diff(current, aggregate_mock_tests(user_ref, transaction))
+    expected = {field: value for field, value in expected.items() if field in diff}
+    if current.get("joinedAt") is None:
+        joined_at = first_activity_at(user_ref, transaction)
+        if joined_at is not None:
+            expected["joinedAt"] = joined_at
+            diff["joinedAt"] = {"old": None, "new": joined_at}
+    return expected, diff
+
+
+def compute_diff(current: Dict[str, Any], totals: Dict[str, float]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    (expected aggregates, per-field diff against the current profile).
+    """
+    if totals["count"] == 0 and not any(field in current for field in AGGREGATE_FIELDS):
+        return {}, {}
+    expected = {
+        "totalTests": totals["count"],
+        "testScoreSum": totals["sum"],
+        "averageScore": totals["sum"] / totals["count"] if totals["count"] else 0,
+    }
+    diff = {
+        field: {"old": current.get(field), "new": value}
+        for field, value in expected.items()
+        if current.get(field) is None or abs(current.get(field) - value) > 1e-6
+    }
+    return expected, diff
+
+
+def recompute_user(db, snapshot, dry_run: bool) -> Optional[Dict[str, Any]]:
+    """
+    Returns the diff for one user (None if already correct), writing it unless dry_run.
+    The write re-reads the profile and aggregates inside one transaction. A save
+    commits its activity and its profile Increments in one batch, which either lands
+    before the transaction's reads (and is counted) or waits on the profile lock and
+    applies on top of the rewrite, so a result submitted meanwhile is never lost.
+    """
+    if dry_run:
+        return compute_changes(snapshot.reference, snapshot.to_dict() or {})[1] or None
+
+    from firebase_admin import firestore
+
+    @firestore.transactional
+    def apply(transaction):
+        doc = snapshot.reference.get(field_paths=PROFILE_FIELDS, transaction=transaction)
+        if not doc.exists:
+            return None
+        expected, diff = compute_changes(snapshot.reference, doc.to_dict() or {}, transaction)
+        if diff:
+            transaction.update(snapshot.reference, expected)
+        return diff or None
+
+    return apply(db.transaction())
+
+
+def run(page_size: int, concurrency: int, checkpoint_path: str, dry_run: bool, user_id: Optional[str] = None):
+    db = get_db()
+    users = db.collection("users")
+
+    if user_id:
+        snapshot = users.document(user_id).get(field_paths=PROFILE_FIELDS)
+        if not snapshot.exists:
+            print(f"{user_id}: no profile")
+            return
+        diff = recompute_user(db, snapshot, dry_run)
+        print(f"{user_id}: {diff or 'up to date'}")
+        return
+
+    # Dry runs never advance the real checkpoint
+    checkpoint = load_checkpoint(checkpoint_path) if not dry_run else {"last_user_id": None, "processed": 0, "changed": 0}
+    if checkpoint["last_user_id"]:
+        print(f"Resuming after user {checkpoint['last_user_id']} ({checkpoint['processed']} already processed)")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            query = users.order_by("__name__").select(PROFILE_FIELDS).limit(page_size)
+            if checkpoint["last_user_id"]:
+                query = query.start_after({"__name__": users.document(checkpoint["last_user_id"])})
+            page = list(query.stream())
+            if not page:
+                break
+
+            diffs = list(pool.map(lambda snap: recompute_user(db, snap, dry_run), page))
+            for snap, diff in zip(page, diffs):
+                if diff:
+                    checkpoint["changed"] += 1
+                    print(f"{'[dry-run] ' if dry_run else ''}{snap.id}: {diff}")
+
+            checkpoint["processed"] += len(page)
+            checkpoint["last_user_id"] = page[-1].id
+            if not dry_run:
+                save_checkpoint(checkpoint_path, checkpoint)
+            print(f"... {checkpoint['processed']} users processed, {checkpoint['changed']} changed")
+
+    print(f"✅ Done: {checkpoint['processed']} users processed, {checkpoint['changed']} {'would change' if dry_run else 'updated'}.")
+    if not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute mock test aggregates for all users")
+    parser.add_argument("--page-size", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", default="recompute_stats.checkpoint.json")
+    parser.add_argument("--dry-run", action="store_true", help="print the diff without writing")
+    parser.add_argument("--reset", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--user", help="recompute a single user id")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    run(args.page_size, args.concurrency, args.checkpoint, args.dry_run, args.user)
@@ -0,0 +1,300 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Shared resilience layer for outbound calls (OpenAI, Lemonfox, Firestore).
+# Each upstream gets an UpstreamPolicy:
+#   - a per-attempt timeout and an overall deadline across retries
+#   - bounded retries with exponential full-jitter backoff, on transient errors only
+#   - a circuit breaker: after N consecutive transient failures the upstream is
+#     "open" and calls fail fast with CircuitOpenError (-> 503 + Retry-After)
+#     until a half-open probe succeeds
+# Configured per upstream with <UPSTREAM>_TIMEOUT_SECONDS, <UPSTREAM>_DEADLINE_SECONDS,
+# <UPSTREAM>_MAX_ATTEMPTS, <UPSTREAM>_BREAKER_THRESHOLD, <UPSTREAM>_BREAKER_RECOVERY_SECONDS.
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {math.ceil(retry_after)}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class UpstreamStatusError(Exception):
+    """
+    Non-2xx response from an HTTP upstream (keeps the status for the retry decision).
+    """
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Request failed: {status_code} - {text}")
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        # Firestore/Lemonfox calls run in worker threads
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the call must not go out.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.recovery_timeout - time.monotonic()
+                if remaining > 0:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes += 1
+
+    def record(self, healthy: Optional[bool]):
+        """
+        healthy=True/False records the outcome; None just releases a half-open slot (e.g. cancelled).
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            if healthy is None:
+                return
+            if healthy:
+                self.failures = 0
+                if self.state != self.CLOSED:
+                    print(f"Circuit {self.name} closed")
+                self.state = self.CLOSED
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.stats["opened"] += 1
+                print(f"Warning: circuit {self.name} opened after {self.failures} consecutive failures")
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_after = 0.0
+        if self.state == self.OPEN:
+            retry_after = max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+        return {
+            "state": self.state,
+            "state_code": {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state],
+            "consecutive_failures": self.failures,
+            "retry_after_seconds": round(retry_after, 1),
+            **self.stats,
+        }
+
+
+class UpstreamPolicy:
+    def __init__(
+        self,
+        name: str,
+        is_transient: Callable[[BaseException], bool],
+        timeout: float,
+        deadline: float,
+        max_attempts: int = 3,
+        base_backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.name = name
+        self.is_transient = is_transient
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker(name)
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+
+    def _transient(self, error: BaseException) -> bool:
+        return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or self.is_transient(error)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def _should_retry(self, error: BaseException, attempt: int, attempts: int, give_up_at: float) -> Optional[float]:
+        # Returns the backoff delay, or None to give up
+        if not self._transient(error) or attempt >= attempts:
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= give_up_at:
+            return None
+        self.stats["retries"] += 1
+        return delay
+
+    async def call(self, fn: Callable[[], Awaitable[T]], retry: bool = True) -> T:
+        """
+        Runs an async call under the breaker, per-attempt timeout and overall deadline.
+        retry=False for non-idempotent calls.
+        """
+        self.stats["calls"] += 1
+        attempts = self.max_attempts if retry else 1
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            timeout = max(0.001, min(self.timeout, give_up_at - time.monotonic()))
+            try:
+                result = await asyncio.wait_for(fn(), timeout=timeout)
+            except asyncio.CancelledError:
+                self.breaker.record(None)
+                raise
+            except Exception as e:
+                transient = self._transient(e)
+                self.breaker.record(not transient)
+                delay = self._should_retry(e, attempt, attempts, give_up_at)
+                if delay is None:
+                    self.stats["failures"] += 1
+                    raise
+                print(f"Retrying {self.name} in {delay:.2f}s after {type(e).__name__}: {e}")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record(True)
+            return result
+
+    def call_sync(self, fn: Callable[[float], T], retry: bool = True) -> T:
+        """
+        Blocking variant for requests/Firestore (run from worker threads).
+        `fn` receives the per-attempt timeout and must pass it to the client call.
+        """
+        self.stats["calls"] += 1
+        attempts = self.max_attempts if retry else 1
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            timeout = max(0.001, min(self.timeout, give_up_at - time.monotonic()))
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                transient = self._transient(e)
+                self.breaker.record(not transient)
+                delay = self._should_retry(e, attempt, attempts, give_up_at)
+                if delay is None:
+                    self.stats["failures"] += 1
+                    raise
+                print(f"Retrying {self.name} in {delay:.2f}s after {type(e).__name__}: {e}")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.record(None)
+                raise
+            self.breaker.record(True)
+            return result
+
+    @contextmanager
+    def guard(self):
+        """
+        Breaker accounting only (no timeout or retry), for calls that can't be replayed such as streams.
+        """
+        self.stats["calls"] += 1
+        self.breaker.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.breaker.record(not self._transient(e))
+            self.stats["failures"] += 1
+            raise
+        except BaseException:
+            self.breaker.record(None)
+            raise
+        else:
+            self.breaker.record(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "timeout_seconds": self.timeout,
+            "deadline_seconds": self.deadline,
+            "max_attempts": self.max_attempts,
+            **self.stats,
+            "breaker": self.breaker.snapshot(),
+        }
+
+
+# ---- transient error classification ------------------------------------------
+
+def _openai_transient(error: BaseException) -> bool:
+    import openai
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+
+def _http_transient(error: BaseException) -> bool:
+    if isinstance(error, UpstreamStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    import httpx
+    import requests
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError))
+
+
+def _firestore_transient(error: BaseException) -> bool:
+    from google.api_core import exceptions
+    return isinstance(error, (
+        exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+        exceptions.TooManyRequests, exceptions.Aborted,
+    ))
+
+
+def _policy_from_env(name: str, is_transient, timeout: float, deadline: float, max_attempts: int) -> UpstreamPolicy:
+    prefix = name.upper()
+    return UpstreamPolicy(
+        name=name,
+        is_transient=is_transient,
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", timeout)),
+        deadline=float(os.getenv(f"{prefix}_DEADLINE_SECONDS", deadline)),
+        max_attempts=int(os.getenv(f"{prefix}_MAX_ATTEMPTS", max_attempts)),
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv(f"{prefix}_BREAKER_THRESHOLD", "5")),
+            recovery_timeout=float(os.getenv(f"{prefix}_BREAKER_RECOVERY_SECONDS", "30")),
+        ),
+    )
+
+
+_policies: Optional[Dict[str, UpstreamPolicy]] = None
+_policies_lock = threading.Lock()
+
+
+def get_policies() -> Dict[str, UpstreamPolicy]:
+    global _policies
+    with _policies_lock:
+        if _policies is None:
+            _policies = {
+                "openai": _policy_from_env("openai", _openai_transient, timeout=120, deadline=180, max_attempts=3),
+                "lemonfox": _policy_from_env("lemonfox", _http_transient, timeout=30, deadline=60, max_attempts=3),
+                "firestore": _policy_from_env("firestore", _firestore_transient, timeout=10, deadline=20, max_attempts=3),
+            }
+    return _policies
+
+
+def get_policy(name: str) -> UpstreamPolicy:
+    return get_policies()[name]
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# State shared by the worker processes of one host (WEB_CONCURRENCY > 1).
+# Backed by a SQLite file in WAL mode (SHARED_STATE_PATH): every worker opens its
+# own connection and SQLite's file locking serialises the writes.
+#   - kv:      small JSON values with a TTL (interview/audio session metadata)
+#   - leases:  cross-process single-flight; one worker holds the lease for a key
+#              while the others poll for its result (see coalesce())
+#   - buckets: token buckets for the per-user rate limit, so a user's budget is
+#              the same whichever worker their request lands on
+# The generation cache shares the same file through its own SQLite tier.
+# Operations are short transactions; a worker that can't get the write lock within
+# SHARED_STATE_BUSY_MS raises sqlite3.OperationalError and callers fall back to
+# their per-process behaviour.
+
+
+def worker_count() -> int:
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def shared_state_path() -> Optional[str]:
+    """
+    The shared SQLite file, or None when running a single worker without SHARED_STATE_PATH.
+    """
+    path = os.getenv("SHARED_STATE_PATH")
+    if path:
+        return path
+    return "shared_state.sqlite3" if worker_count() > 1 else None
+
+
+class SharedState:
+    def __init__(self, path: str, busy_ms: int = 50, lease_ttl: float = 120.0):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_ms / 1000, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);"
+        )
+        self._writes = 0
+        self.stats = {
+            "leases_acquired": 0, "lease_waits": 0, "follower_hits": 0, "follower_timeouts": 0,
+            "lock_timeouts": 0,
+        }
+
+    def _write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        # One IMMEDIATE transaction: takes the write lock up front, so read-modify-write is atomic across processes
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                self.stats["lock_timeouts"] += 1
+                raise
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+        if self._writes % 1000 == 0:
+            self.purge_expired()
+        return result
+
+    def purge_expired(self):
+        now = time.time()
+
+        def purge(conn):
+            conn.execute("DELETE FROM kv WHERE expires_at < ?", (now,))
+            conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+            # Idle buckets have long since refilled; dropping them just resets them to full
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+
+        try:
+            self._write(purge)
+        except sqlite3.OperationalError:
+            pass
+
+    # ---- kv ------------------------------------------------------------------
+
+    def get_json(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_json(self, key: str, value: Any, ttl: float):
+        payload = json.dumps(value)
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, payload, time.time() + ttl)
+        ))
+
+    def delete(self, key: str):
+        self._write(lambda conn: conn.execute("DELETE FROM kv WHERE key = ?", (key,)))
+
+    # ---- leases --------------------------------------------------------------
+
+    def acquire_lease(self, key: str, ttl: Optional[float] = None) -> bool:
+        """
+        True if this process now holds the lease (free, expired or already ours).
+        """
+        now = time.time()
+        expires_at = now + (self.lease_ttl if ttl is None else ttl)
+
+        def acquire(conn):
+            return conn.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+                (key, self.owner, expires_at, now),
+            ).rowcount == 1
+
+        return self._write(acquire)
+
+    def release_lease(self, key: str):
+        self._write(lambda conn: conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner)))
+
+    async def coalesce(
+        self,
+        key: str,
+        produce: Callable[[], Awaitable[T]],
+        peek: Callable[[], Awaitable[Optional[T]]],
+        wait_timeout: float
+    ) -> T:
+        """
+        Cross-process single-flight: the worker that wins the lease runs produce()
+        (which must publish its result where peek() can see it); the others poll
+        peek() until the result appears, the lease is released/expires (they then
+        try for it themselves) or wait_timeout passes (they produce on their own).
+        """
+        give_up_at = time.monotonic() + wait_timeout
+        delay = 0.05
+        waited = False
+        while True:
+            try:
+                acquired = await asyncio.to_thread(self.acquire_lease, key)
+            except sqlite3.OperationalError:
+                acquired = False
+            if acquired:
+                self.stats["leases_acquired"] += 1
+                try:
+                    # The previous holder may have published just before releasing
+                    value = await peek() if waited else None
+                    if value is not None:
+                        self.stats["follower_hits"] += 1
+                        return value
+                    return await produce()
+                finally:
+                    try:
+                        await asyncio.to_thread(self.release_lease, key)
+                    except sqlite3.OperationalError:
+                        pass # expires on its own
+            self.stats["lease_waits"] += 1
+            waited = True
+            await asyncio.sleep(delay)
+            delay = min(1.0, delay * 2)
+            value = await peek()
+            if value is not None:
+                self.stats["follower_hits"] += 1
+                return value
+            if time.monotonic() >= give_up_at:
+                self.stats["follower_timeouts"] += 1
+                return await produce()
+
+    # ---- token buckets -------------------------------------------------------
+
+    def take_tokens(self, key: str, cost: float, burst: float, rate: float) -> Tuple[bool, float]:
+        """
+        Token bucket shared across workers. Returns (allowed, tokens left before the take).
+        """
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - cost if allowed else tokens, now),
+            )
+            return allowed, tokens
+
+        return self._write(take)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": self.path, "workers": worker_count(), **self.stats}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_state: Optional[SharedState] = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """
+    The per-process handle on the shared state, or None in single-process mode.
+    """
+    global _state
+    path = shared_state_path()
+    if path is None:
+        return None
+    with _state_lock:
+        if _state is None:
+            _state = SharedState(
+                path,
+                busy_ms=int(os.getenv("SHARED_STATE_BUSY_MS", "50")),
+                lease_ttl=float(os.getenv("SHARED_LEASE_TTL_SECONDS", "120")),
+            )
+    return _state
+
+
+def close_shared_state():
+    global _state
+    with _state_lock:
+        if _state is not None:
+            _state.close()
+            _state = None
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """
+    In-process request coalescing: concurrent calls with the same key share one
+    upstream task instead of each starting their own.
+
+    Every waiter awaits the shared task through asyncio.shield, so a waiter that
+    times out or is cancelled (e.g. the client disconnected) never cancels the
+    upstream call the other waiters depend on.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "joined": 0, "waiter_timeouts": 0, "waiter_cancellations": 0, "errors": 0}
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the outcome so a failure nobody waited for isn't logged as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["joined"] += 1
+
+        try:
+            if timeout is None:
+                return await asyncio.shield(task)
+            return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["waiter_timeouts"] += 1
+            raise
+        except asyncio.CancelledError:
+            self.stats["waiter_cancellations"] += 1
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "upstream_calls_saved": self.stats["joined"],
+            "in_flight": len(self._inflight),
+        }
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
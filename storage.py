@@ -0,0 +1,301 @@
+import abc
+import bisect
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from firebase_utils import average_score, decode_cursor, encode_cursor
+from metrics import track_upstream
+
+load_dotenv()
+
+# Result persistence behind one interface, so the write-behind worker and the
+# dashboard endpoints don't care where results live.
+#   - firestore: the existing firebase_utils functions (default)
+#   - sqlite:    local file in WAL mode, for self-hosted deployments and benchmarks
+#   - memory:    process-local dicts, for tests and load runs without a database
+# Selected with STORAGE_BACKEND; the SQLite file is STORAGE_SQLITE_PATH.
+# Every backend keeps the same semantics: activity_id makes a save idempotent,
+# averageScore is derived from testScoreSum/totalTests, a new profile starts
+# with streakDays 1, and activities page newest-first with the same opaque cursor.
+
+
+class ResultStore(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def save_test_result(
+        self, user_id: str, topic: str, difficulty: str, score: float, total_questions: int,
+        activity_id: Optional[str] = None
+    ):
+        ...
+
+    @abc.abstractmethod
+    def save_interview_result(self, user_id: str, topic: str, difficulty: str, feedback: dict, activity_id: Optional[str] = None):
+        ...
+
+    @abc.abstractmethod
+    def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def list_activities(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    def close(self):
+        pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(timestamp: datetime) -> str:
+    # Fixed-width UTC ISO strings sort lexicographically in time order
+    return timestamp.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _test_activity(topic: str, difficulty: str, score: float, total_questions: int) -> Dict[str, Any]:
+    return {
+        "type": "mock_test",
+        "topic": topic,
+        "difficulty": difficulty,
+        "score": score,
+        "total_questions": total_questions,
+        "date_str": datetime.now().strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def _interview_activity(topic: str, difficulty: str, feedback: dict) -> Dict[str, Any]:
+    return {
+        "type": "mock_interview",
+        "topic": topic,
+        "difficulty": difficulty,
+        "score": feedback.get("overall_score", 0),
+        "feedback_summary": feedback.get("overall_feedback", "")[:200],
+        "date_str": datetime.now().strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+class FirestoreResultStore(ResultStore):
+    """
+    Thin wrapper over firebase_utils (batched writes, projected reads, read cache).
+    """
+    name = "firestore"
+
+    def save_test_result(self, user_id, topic, difficulty, score, total_questions, activity_id=None):
+        import firebase_utils
+        firebase_utils.save_test_result(user_id, topic, difficulty, score, total_questions, activity_id=activity_id)
+
+    def save_interview_result(self, user_id, topic, difficulty, feedback, activity_id=None):
+        import firebase_utils
+        firebase_utils.save_interview_result(user_id, topic, difficulty, feedback, activity_id=activity_id)
+
+    def get_profile(self, user_id):
+        import firebase_utils
+        return firebase_utils.get_profile(user_id)
+
+    def list_activities(self, user_id, limit=20, cursor=None):
+        import firebase_utils
+        return firebase_utils.list_activities(user_id, limit, cursor)
+
+
+ACTIVITY_COLUMNS = ["type", "topic", "difficulty", "score", "total_questions", "feedback_summary", "timestamp", "date_str"]
+PROFILE_COLUMNS = ["totalTests", "testScoreSum", "interviewCount", "interviewHours", "streakDays", "joinedAt", "lastActive"]
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    One connection shared by the worker threads (writes are serialised anyway).
+    A save is a single transaction: INSERT OR IGNORE on the activity id, and the
+    aggregates are only bumped when the row was actually inserted.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable across application crashes, fsync only at checkpoints
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id TEXT PRIMARY KEY, totalTests INTEGER NOT NULL DEFAULT 0,"
+            " testScoreSum REAL NOT NULL DEFAULT 0, interviewCount INTEGER NOT NULL DEFAULT 0,"
+            " interviewHours REAL NOT NULL DEFAULT 0, streakDays INTEGER NOT NULL DEFAULT 1,"
+            " joinedAt TEXT, lastActive TEXT);"
+            "CREATE TABLE IF NOT EXISTS activities ("
+            " id TEXT PRIMARY KEY, user_id TEXT NOT NULL, type TEXT NOT NULL, topic TEXT,"
+            " difficulty TEXT, score REAL, total_questions INTEGER, feedback_summary TEXT,"
+            " timestamp TEXT NOT NULL, date_str TEXT);"
+            "CREATE INDEX IF NOT EXISTS activities_user_timestamp"
+            " ON activities (user_id, timestamp DESC, id DESC);"
+        )
+        self._conn.commit()
+
+    def _save(self, user_id: str, activity_id: Optional[str], activity: Dict[str, Any], tests: int, score_sum: float, interviews: int):
+        now = _iso(_now())
+        row = {"id": activity_id or uuid.uuid4().hex, "user_id": user_id, "timestamp": now, **activity}
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{c}" for c in row)
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                f"INSERT OR IGNORE INTO activities ({columns}) VALUES ({placeholders})", row
+            ).rowcount
+            if not inserted:
+                print(f"DEBUG: activity {row['id']} was already applied, skipping")
+                return
+            self._conn.execute(
+                # streakDays is explicit: files created before its DEFAULT became 1 still say 0
+                "INSERT INTO users (user_id, totalTests, testScoreSum, interviewCount, streakDays, joinedAt, lastActive)"
+                " VALUES (?, ?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " totalTests = totalTests + excluded.totalTests,"
+                " testScoreSum = testScoreSum + excluded.testScoreSum,"
+                " interviewCount = interviewCount + excluded.interviewCount,"
+                " lastActive = excluded.lastActive",
+                (user_id, tests, score_sum, interviews, now, now),
+            )
+
+    def save_test_result(self, user_id, topic, difficulty, score, total_questions, activity_id=None):
+        with track_upstream("sqlite", "save_test_result"):
+            self._save(user_id, activity_id, _test_activity(topic, difficulty, score, total_questions), 1, score, 0)
+
+    def save_interview_result(self, user_id, topic, difficulty, feedback, activity_id=None):
+        with track_upstream("sqlite", "save_interview_result"):
+            self._save(user_id, activity_id, _interview_activity(topic, difficulty, feedback), 0, 0, 1)
+
+    def get_profile(self, user_id):
+        with track_upstream("sqlite", "get_profile"), self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(PROFILE_COLUMNS)} FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        profile = dict(row)
+        profile["averageScore"] = average_score(profile)
+        return profile
+
+    def list_activities(self, user_id, limit=20, cursor=None):
+        sql = f"SELECT id, {', '.join(ACTIVITY_COLUMNS)} FROM activities WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if cursor:
+            position = decode_cursor(cursor)
+            sql += " AND (timestamp, id) < (?, ?)"
+            params += [_iso(position["ts"]), position["id"]]
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with track_upstream("sqlite", "list_activities"), self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        items = [{k: v for k, v in dict(row).items() if v is not None} for row in rows]
+        next_cursor = None
+        if len(items) == limit:
+            next_cursor = encode_cursor(datetime.fromisoformat(items[-1]["timestamp"]), items[-1]["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryResultStore(ResultStore):
+    """
+    Per-user activity lists kept sorted by (timestamp, id). Nothing survives a restart.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._activities: Dict[str, List[Tuple[str, str]]] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+    def _save(self, user_id: str, activity_id: Optional[str], activity: Dict[str, Any], tests: int, score_sum: float, interviews: int):
+        activity_id = activity_id or uuid.uuid4().hex
+        now = _iso(_now())
+        with self._lock:
+            if activity_id in self._records:
+                print(f"DEBUG: activity {activity_id} was already applied, skipping")
+                return
+            self._records[activity_id] = {"id": activity_id, **activity, "timestamp": now}
+            bisect.insort(self._activities.setdefault(user_id, []), (now, activity_id))
+            profile = self._profiles.setdefault(user_id, {
+                "totalTests": 0, "testScoreSum": 0, "interviewCount": 0, "interviewHours": 0,
+                "streakDays": 1, "joinedAt": now,
+            })
+            profile["totalTests"] += tests
+            profile["testScoreSum"] += score_sum
+            profile["interviewCount"] += interviews
+            profile["lastActive"] = now
+
+    def save_test_result(self, user_id, topic, difficulty, score, total_questions, activity_id=None):
+        self._save(user_id, activity_id, _test_activity(topic, difficulty, score, total_questions), 1, score, 0)
+
+    def save_interview_result(self, user_id, topic, difficulty, feedback, activity_id=None):
+        self._save(user_id, activity_id, _interview_activity(topic, difficulty, feedback), 0, 0, 1)
+
+    def get_profile(self, user_id):
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                return None
+            profile = dict(profile)
+        profile["averageScore"] = average_score(profile)
+        return profile
+
+    def list_activities(self, user_id, limit=20, cursor=None):
+        with self._lock:
+            keys = self._activities.get(user_id, [])
+            end = len(keys)
+            if cursor:
+                position = decode_cursor(cursor)
+                end = bisect.bisect_left(keys, (_iso(position["ts"]), position["id"]))
+            page = keys[max(0, end - limit):end][::-1]
+            items = [dict(self._records[activity_id]) for _, activity_id in page]
+        next_cursor = None
+        if len(items) == limit:
+            next_cursor = encode_cursor(datetime.fromisoformat(items[-1]["timestamp"]), items[-1]["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+BACKENDS = ("firestore", "sqlite", "memory")
+
+
+def storage_backend() -> str:
+    backend = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})")
+    return backend
+
+
+def get_result_store() -> ResultStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = storage_backend()
+            if backend == "sqlite":
+                _store = SQLiteResultStore(os.getenv("STORAGE_SQLITE_PATH", "results.sqlite3"))
+            elif backend == "memory":
+                _store = MemoryResultStore()
+            else:
+                _store = FirestoreResultStore()
+            print(f"DEBUG: result storage backend: {_store.name}")
+    return _store
+
+
+def close_result_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
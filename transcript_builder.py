@@ -0,0 +1,172 @@
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token-budgeted prompt assembly.
+# Speech-to-text answers can be arbitrarily long, so every body that goes into a
+# prompt is compacted deterministically before it is sent:
+#   1. whitespace collapse (always)
+#   2. filler-word removal (only if still over budget)
+#   3. head/tail truncation, keeping the opening and the conclusion
+# Headers (e.g. the question text) are never trimmed. Original and compacted
+# token counts are recorded so the savings are visible.
+
+ANSWER_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_ANSWER_TOKEN_BUDGET", "600"))
+TOTAL_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOTAL_TOKEN_BUDGET", "6000"))
+
+FILLER_PATTERN = re.compile(
+    r"(?<![\w'])(?:um+|uh+|erm|er|hmm+|ah+|you know|i mean|basically|literally)(?![\w'])[,.]?\s*",
+    re.IGNORECASE,
+)
+TRUNCATION_MARKER = " [...] "
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when it (and its encoding files) are available,
+    otherwise falls back to the ~4 characters per token approximation.
+    """
+
+    _encodings: Dict[str, Any] = {}
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self.encoding = self._load_encoding(model)
+
+    @classmethod
+    def _load_encoding(cls, model: str):
+        if model in cls._encodings:
+            return cls._encodings[model]
+        encoding = None
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Not installed, or the encoding file can't be fetched (offline)
+            print(f"Token counting falls back to character estimate: {e}")
+        cls._encodings[model] = encoding
+        return encoding
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return (len(text) + 3) // 4
+
+    def head_tail(self, text: str, max_tokens: int) -> str:
+        """
+        Keeps roughly the first 2/3 and last 1/3 of the allowed tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        head_tokens = (max_tokens * 2) // 3
+        tail_tokens = max_tokens - head_tokens
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text)
+            head = self.encoding.decode(tokens[:head_tokens])
+            tail = self.encoding.decode(tokens[-tail_tokens:]) if tail_tokens else ""
+        else:
+            head = text[:head_tokens * 4]
+            tail = text[-tail_tokens * 4:] if tail_tokens else ""
+        return head.rstrip() + TRUNCATION_MARKER + tail.lstrip()
+
+
+def collapse_whitespace(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def remove_fillers(text: str) -> Tuple[str, int]:
+    cleaned, removed = FILLER_PATTERN.subn("", text)
+    return collapse_whitespace(cleaned), removed
+
+
+def compact_text(text: str, max_tokens: int, counter: TokenCounter) -> Dict[str, Any]:
+    """
+    Compacts one body to at most `max_tokens`, applying the cheapest steps first.
+    """
+    original_tokens = counter.count(text or "")
+    compacted = collapse_whitespace(text)
+    fillers_removed = 0
+    if counter.count(compacted) > max_tokens:
+        compacted, fillers_removed = remove_fillers(compacted)
+    truncated = counter.count(compacted) > max_tokens
+    if truncated:
+        compacted = counter.head_tail(compacted, max_tokens)
+    return {
+        "text": compacted,
+        "original_tokens": original_tokens,
+        "compacted_tokens": counter.count(compacted),
+        "fillers_removed": fillers_removed,
+        "truncated": truncated,
+    }
+
+
+class TranscriptBuilder:
+    """
+    Assembles header/body items (e.g. question + candidate answer) into one
+    prompt section under a per-item and a total token budget.
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        per_item_tokens: int = ANSWER_TOKEN_BUDGET,
+        total_tokens: int = TOTAL_TOKEN_BUDGET,
+        separator: str = "\n" + "-" * 20
+    ):
+        self.counter = TokenCounter(model)
+        self.per_item_tokens = per_item_tokens
+        self.total_tokens = total_tokens
+        self.separator = separator
+        self._items: List[Dict[str, str]] = []
+        self.stats: Dict[str, Any] = {}
+
+    def add(self, header: str, body: str, body_label: str = "Candidate Answer"):
+        self._items.append({"header": header, "body": body or "", "label": body_label})
+        return self
+
+    def _allocate(self, sizes: List[int], available: int) -> List[int]:
+        # Fair share: small bodies keep everything, the rest split what's left evenly
+        budgets = [0] * len(sizes)
+        remaining = max(0, available)
+        order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+        for position, i in enumerate(order):
+            share = remaining // (len(order) - position)
+            budgets[i] = min(sizes[i], share)
+            remaining -= budgets[i]
+        return budgets
+
+    def build(self) -> str:
+        counter = self.counter
+        first_pass = [compact_text(item["body"], self.per_item_tokens, counter) for item in self._items]
+
+        frames = [f"\n{item['header']}\n{item['label']}: " for item in self._items]
+        overhead = sum(counter.count(frame) for frame in frames) + counter.count(self.separator) * len(frames)
+        sizes = [result["compacted_tokens"] for result in first_pass]
+        budgets = self._allocate(sizes, self.total_tokens - overhead)
+
+        results = []
+        for item, result, budget in zip(self._items, first_pass, budgets):
+            if result["compacted_tokens"] > budget:
+                second = compact_text(item["body"], budget, counter)
+                second["original_tokens"] = result["original_tokens"]
+                result = second
+            results.append(result)
+
+        parts = [frame + result["text"] + self.separator for frame, result in zip(frames, results)]
+        self.stats = {
+            "original_tokens": sum(r["original_tokens"] for r in results),
+            "compacted_tokens": sum(r["compacted_tokens"] for r in results),
+            "items_truncated": sum(1 for r in results if r["truncated"]),
+            "fillers_removed": sum(r["fillers_removed"] for r in results),
+            "exact": counter.encoding is not None,
+        }
+        return "".join(parts)
@@ -1,12 +1,230 @@
-import requests
+import io
 import os
+import tempfile
+import time
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
-from typing import Optional
+from typing import IO, Any, AsyncIterator, Dict, Optional
+
+from admission import get_limiter
+from metrics import TTS_FIRST_BYTE_SECONDS, track_upstream
+from resilience import UpstreamStatusError, get_policy
 
 
 
 load_dotenv()
 api_key = os.getenv("LEMONFOX_API_KEY")
+# Overridable so benchmarks can point at a local stand-in (benchmarks/fake_lemonfox.py)
+LEMONFOX_BASE_URL = os.getenv("LEMONFOX_BASE_URL", "https://api.lemonfox.ai").rstrip("/")
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg", "wav": "audio/wav", "opus": "audio/ogg",
+    "aac": "audio/aac", "flac": "audio/flac", "pcm": "audio/pcm",
+}
+
+# Pooled HTTP sessions for Lemonfox, created on first use: a requests.Session for
+# the blocking helpers below and an httpx.AsyncClient for the streaming endpoints.
+# `requests`/`httpx` are imported lazily so importing this module stays cheap.
+_session = None
+_async_client = None
+
+
+def is_configured() -> bool:
+    return bool(os.getenv("LEMONFOX_API_KEY"))
+
+
+def is_initialized() -> bool:
+    return _session is not None or _async_client is not None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
+
+
+def close_session():
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        import httpx
+
+        max_connections = int(os.getenv("LEMONFOX_MAX_CONNECTIONS", "50"))
+        _async_client = httpx.AsyncClient(
+            base_url=LEMONFOX_BASE_URL,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # The read timeout applies per chunk, so long audio can keep streaming
+            timeout=httpx.Timeout(get_policy("lemonfox").timeout, connect=10.0),
+        )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+class SpeechStream:
+    """
+    An open Lemonfox speech response whose first chunk has already arrived.
+    Iterating it relays the audio and then releases the connection and the admission slot.
+    """
+
+    def __init__(self, first_chunk: bytes, chunks: AsyncIterator[bytes], media_type: str, first_byte_seconds: float, resources: AsyncExitStack):
+        self.first_chunk = first_chunk
+        self.chunks = chunks
+        self.media_type = media_type
+        self.first_byte_seconds = first_byte_seconds
+        self._resources = resources
+
+    async def __aiter__(self):
+        try:
+            if self.first_chunk:
+                yield self.first_chunk
+            async for chunk in self.chunks:
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        await self._resources.aclose()
+
+
+async def open_speech_stream(text: str, voice: str = "sarah", response_format: str = "mp3") -> SpeechStream:
+    """
+    Starts a streaming synthesis and waits for the first audio byte.
+    Everything up to that byte is retried like any other Lemonfox call (nothing has
+    reached the client yet); after it the audio is relayed as it arrives, with no temp file.
+    """
+    client = get_async_client()
+    headers = {"Authorization": f"Bearer {os.getenv('LEMONFOX_API_KEY')}"}
+    data = {"input": text, "voice": voice, "response_format": response_format}
+    started = time.perf_counter()
+
+    async def attempt():
+        request = client.build_request("POST", "/v1/audio/speech", headers=headers, json=data)
+        response = None
+        try:
+            with track_upstream("lemonfox", "tts_first_byte"):
+                response = await client.send(request, stream=True)
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise UpstreamStatusError(response.status_code, body.decode("utf-8", "replace")[:500])
+                chunks = response.aiter_bytes()
+                try:
+                    first_chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    first_chunk = b""
+        except BaseException:
+            # Includes the policy's per-attempt timeout cancelling us mid-read
+            if response is not None:
+                await response.aclose()
+            raise
+        return response, chunks, first_chunk
+
+    resources = AsyncExitStack()
+    try:
+        # Concurrency cap for Lemonfox (-> 503 when saturated), held until the audio is relayed
+        await resources.enter_async_context(get_limiter("lemonfox").slot())
+        response, chunks, first_chunk = await get_policy("lemonfox").call(attempt)
+        resources.push_async_callback(response.aclose)
+    except BaseException:
+        await resources.aclose()
+        raise
+
+    first_byte_seconds = time.perf_counter() - started
+    TTS_FIRST_BYTE_SECONDS.labels(response_format).observe(first_byte_seconds)
+    media_type = MEDIA_TYPES.get(response_format) or response.headers.get("content-type", "application/octet-stream")
+    return SpeechStream(first_chunk, chunks, media_type, first_byte_seconds, resources)
+
+
+# Uploads up to TRANSCRIBE_SPOOL_MB stay in memory, larger ones roll over to a temp file
+TRANSCRIBE_SPOOL_BYTES = int(float(os.getenv("TRANSCRIBE_SPOOL_MB", "1")) * 1024 * 1024)
+TRANSCRIBE_MAX_BYTES = int(float(os.getenv("TRANSCRIBE_MAX_MB", "25")) * 1024 * 1024)
+AUDIO_EXTENSIONS = {
+    "audio/mpeg": "mp3", "audio/mp3": "mp3", "audio/wav": "wav", "audio/x-wav": "wav",
+    "audio/wave": "wav", "audio/webm": "webm", "audio/ogg": "ogg", "audio/mp4": "m4a",
+    "audio/x-m4a": "m4a", "audio/flac": "flac", "audio/aac": "aac",
+}
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def spool_upload(chunks: AsyncIterator[bytes], max_bytes: int = TRANSCRIBE_MAX_BYTES) -> IO[bytes]:
+    """
+    Copies a streamed request body into memory, moving it to a temp file once it passes
+    TRANSCRIBE_SPOOL_BYTES, without ever holding a large upload whole.
+    Raises UploadTooLarge past max_bytes and ValueError if it is empty. The caller closes the returned file.
+    """
+    # Not a SpooledTemporaryFile: httpx sizes multipart files through fileno(), which
+    # would roll every in-memory spool over to disk. A BytesIO has no fileno and is
+    # sized with seek/tell instead.
+    spool: IO[bytes] = io.BytesIO()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Audio upload exceeds {max_bytes // (1024 * 1024)}MB")
+            if size > TRANSCRIBE_SPOOL_BYTES and isinstance(spool, io.BytesIO):
+                on_disk = tempfile.TemporaryFile()
+                on_disk.write(spool.getbuffer())
+                spool.close()
+                spool = on_disk
+            spool.write(chunk)
+        if size == 0:
+            raise ValueError("Empty audio upload")
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def transcribe_file(
+    audio: IO[bytes],
+    content_type: str = "application/octet-stream",
+    language: str = "english",
+    response_format: str = "json"
+) -> Dict[str, Any]:
+    """
+    Sends an open audio file to Lemonfox as a multipart upload on the pooled async client.
+    httpx reads the file in chunks while sending, so it is never loaded into memory.
+    """
+    client = get_async_client()
+    headers = {"Authorization": f"Bearer {os.getenv('LEMONFOX_API_KEY')}"}
+    filename = f"audio.{AUDIO_EXTENSIONS.get(content_type.split(';')[0].strip().lower(), 'bin')}"
+    data = {"language": language, "response_format": response_format}
+
+    async def attempt():
+        audio.seek(0) # rewind for retries
+        with track_upstream("lemonfox", "stt_upload"):
+            response = await client.post(
+                "/v1/audio/transcriptions", headers=headers, data=data,
+                files={"file": (filename, audio, content_type)},
+            )
+        if response.status_code != 200:
+            raise UpstreamStatusError(response.status_code, response.text[:500])
+        return response
+
+    # Concurrency cap shared with /api/tts (-> 503 when saturated), then timeout/retries/breaker
+    async with get_limiter("lemonfox").slot():
+        response = await get_policy("lemonfox").call(attempt)
+    if response_format in ("json", "verbose_json"):
+        return response.json()
+    return {"text": response.text}
 
 
 
@@ -32,7 +250,7 @@ def text_to_speech(
         :param response_format: Audio format (default: mp3)
         """
 
-        url = "https://api.lemonfox.ai/v1/audio/speech"
+        url = f"{LEMONFOX_BASE_URL}/v1/audio/speech"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -43,14 +261,18 @@ def text_to_speech(
             "response_format": response_format
         }
 
-        response = requests.post(url, headers=headers, json=data)
+        def attempt(timeout: float):
+            with track_upstream("lemonfox", "tts"):
+                response = get_session().post(url, headers=headers, json=data, timeout=timeout)
+            if response.status_code != 200:
+                raise UpstreamStatusError(response.status_code, response.text)
+            return response
 
-        if response.status_code == 200:
-            with open(output_file, "wb") as f:
-                f.write(response.content)
-            print(f"Audio saved as {output_file}")
-        else:
-            raise Exception(f"Request failed: {response.status_code} - {response.text}")
+        # Timeout, retries on 429/5xx/connection errors and the circuit breaker: see resilience.py
+        response = get_policy("lemonfox").call_sync(attempt)
+        with open(output_file, "wb") as f:
+            f.write(response.content)
+        print(f"Audio saved as {output_file}")
 
 
 
@@ -92,7 +314,7 @@ def speech_to_text(
         if not audio_url and not audio_file_path:
             raise ValueError("Either audio_url or audio_file_path must be provided")
 
-        url = "https://api.lemonfox.ai/v1/audio/transcriptions"
+        url = f"{LEMONFOX_BASE_URL}/v1/audio/transcriptions"
 
         headers = {
             "Authorization": f"Bearer {api_key}"
@@ -118,28 +340,36 @@ def speech_to_text(
                 "file": open(audio_file_path, "rb")
             }
 
-        response = requests.post(
-            url,
-            headers=headers,
-            data=data,
-            files=files
-        )
-
-        if files:
-            files["file"].close()
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(f"Request failed: {response.status_code} - {response.text}")
-
-
-result = speech_to_text(
-    api_key=api_key,
-    audio_file_path="speech.mp3"
-)
-
-# print(result)
+        def attempt(timeout: float):
+            if files:
+                files["file"].seek(0) # rewind for retries
+            with track_upstream("lemonfox", "stt"):
+                response = get_session().post(
+                    url,
+                    headers=headers,
+                    data=data,
+                    files=files,
+                    timeout=timeout
+                )
+            if response.status_code != 200:
+                raise UpstreamStatusError(response.status_code, response.text)
+            return response
+
+        try:
+            response = get_policy("lemonfox").call_sync(attempt)
+        finally:
+            if files:
+                files["file"].close()
+
+        return response.json()
+
+
+if __name__ == "__main__":
+    result = speech_to_text(
+        api_key=api_key,
+        audio_file_path="speech.mp3"
+    )
+    print(result)
 
 
 
@@ -0,0 +1,217 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Write-behind persistence: handlers enqueue results and return immediately,
+# a background worker drains the queue with up to `concurrency` writes in flight.
+# Each write is its own task with retry + backoff; a write that is backing off
+# gives up its slot, so one failing result doesn't hold up the rest of the queue.
+# On shutdown the queue is flushed (bounded by a timeout) and anything left is
+# spilled to a JSONL journal that is replayed on the next startup, so results
+# survive restarts. Writes that exhaust their retries are journaled too.
+# Several workers may share the journal: lines are appended with one write() each
+# and a replaying worker first claims the file by renaming it, so every entry is
+# replayed by exactly one of them.
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[..., None]],
+        maxsize: int = 1000,
+        concurrency: int = 20,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        flush_timeout: float = 10.0,
+        journal_path: str = "write_behind_journal.jsonl"
+    ):
+        self.handlers = handlers
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.flush_timeout = flush_timeout
+        self.journal_path = journal_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._ids = itertools.count()
+        # id -> item for everything not yet written (queued, in flight or backing off)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0, "written": 0, "retries": 0, "failed": 0,
+            "rejected_full": 0, "spilled": 0, "replayed": 0,
+        }
+
+    # ---- producer side ---------------------------------------------------
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queues a write. Returns False when the queue is full (caller should write inline).
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown write kind: {kind}")
+        item = {"id": next(self._ids), "kind": kind, "payload": payload, "enqueued_at": time.time(), "attempts": 0}
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["rejected_full"] += 1
+            return False
+        self._pending[item["id"]] = item
+        self.stats["enqueued"] += 1
+        return True
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queues a write, or performs it inline when the queue is full (backpressure).
+        Returns True if the write was queued.
+        """
+        if self.enqueue(kind, payload):
+            return True
+        await asyncio.to_thread(self.handlers[kind], **payload)
+        return False
+
+    # ---- worker ------------------------------------------------------------
+
+    def _backoff(self, attempts: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempts)))
+
+    async def _write(self, item: Dict[str, Any]):
+        # Starts holding a slot (taken by _run); releases it while backing off
+        handler = self.handlers[item["kind"]]
+        holding = True
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(handler, **item["payload"])
+                    self.stats["written"] += 1
+                    self._pending.pop(item["id"], None)
+                    return
+                except Exception as e:
+                    item["attempts"] += 1
+                    if item["attempts"] > self.max_retries:
+                        print(f"Write-behind: giving up on {item['kind']} after {item['attempts']} attempts: {e}")
+                        self.stats["failed"] += 1
+                        self._spill([item])
+                        return
+                    self.stats["retries"] += 1
+                self._slots.release()
+                holding = False
+                await asyncio.sleep(self._backoff(item["attempts"]))
+                await self._slots.acquire()
+                holding = True
+        finally:
+            if holding:
+                self._slots.release()
+            self._queue.task_done()
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                item = await self._queue.get()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._write(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # ---- journal -------------------------------------------------------------
+
+    def _spill(self, items: List[Dict[str, Any]]):
+        if not items:
+            return
+        with open(self.journal_path, "ab", buffering=0) as f:
+            for item in items:
+                line = json.dumps({k: item[k] for k in ("kind", "payload", "enqueued_at")}) + "\n"
+                f.write(line.encode("utf-8"))
+                self._pending.pop(item["id"], None)
+        self.stats["spilled"] += len(items)
+        print(f"Write-behind: spilled {len(items)} writes to {self.journal_path}")
+
+    def _replay_journal(self):
+        claimed = f"{self.journal_path}.{os.getpid()}.replay"
+        try:
+            os.replace(self.journal_path, claimed)
+        except FileNotFoundError:
+            return # nothing to replay, or another worker took it
+        with open(claimed, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        os.remove(claimed)
+        leftovers = []
+        for entry in entries:
+            if self.enqueue(entry["kind"], entry["payload"]):
+                self.stats["replayed"] += 1
+            else:
+                leftovers.append({"id": -1, **entry})
+        # Anything that didn't fit goes straight back to the journal
+        self._spill(leftovers)
+
+    # ---- lifecycle -------------------------------------------------------------
+
+    def start(self):
+        self._replay_journal()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Flushes for up to flush_timeout seconds, then journals whatever is still pending.
+        """
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.flush_timeout)
+        except asyncio.TimeoutError:
+            print("Write-behind: flush timed out")
+        self._worker.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(self._worker, *self._tasks, return_exceptions=True)
+        self._worker = None
+        self._spill(list(self._pending.values()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        oldest = min((item["enqueued_at"] for item in self._pending.values()), default=None)
+        return {
+            "depth": self._queue.qsize(),
+            "pending": len(self._pending),
+            "oldest_age_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "in_flight": len(self._tasks),
+            "worker_running": self._worker is not None and not self._worker.done(),
+            **self.stats,
+        }
+
+
+_queue: Optional[WriteBehindQueue] = None
+
+
+def get_write_queue() -> WriteBehindQueue:
+    global _queue
+    if _queue is None:
+        from storage import get_result_store
+
+        store = get_result_store()
+        _queue = WriteBehindQueue(
+            handlers={
+                "mock_test": store.save_test_result,
+                "mock_interview": store.save_interview_result,
+            },
+            maxsize=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "1000")),
+            concurrency=int(os.getenv("WRITE_BEHIND_CONCURRENCY", "20")),
+            max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+            flush_timeout=float(os.getenv("WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS", "10")),
+            journal_path=os.getenv("WRITE_BEHIND_JOURNAL", "write_behind_journal.jsonl"),
+        )
+    return _queue